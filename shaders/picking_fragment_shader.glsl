@@ -0,0 +1,9 @@
+#version 330
+
+out uvec2 fragId;
+uniform uint itemId;
+
+void main() {
+    // Item id plus the triangle/segment that was hit
+    fragId = uvec2(itemId, uint(gl_PrimitiveID));
+}
\ No newline at end of file
@@ -0,0 +1,11 @@
+#version 330
+
+flat in uint v_element;
+
+out uvec2 fragId;
+uniform uint itemId;
+
+void main() {
+    // Item id plus the point index within the group
+    fragId = uvec2(itemId, v_element);
+}
\ No newline at end of file
@@ -0,0 +1,9 @@
+#version 330
+
+in vec3 in_vert;
+
+uniform mat4 matrix; // Camera matrix
+
+void main() {
+    gl_Position = matrix * vec4(in_vert, 1.0);
+}
\ No newline at end of file
@@ -0,0 +1,19 @@
+#version 330
+
+flat in int v_state;
+
+out vec4 fragColor;
+uniform vec3 color;
+uniform vec3 hoveredColor;
+uniform vec3 selectedColor;
+uniform float alphaValue = 1.0;
+
+void main() {
+    if (v_state == 2) {
+        fragColor = vec4(selectedColor, alphaValue);
+    } else if (v_state == 1) {
+        fragColor = vec4(hoveredColor, alphaValue);
+    } else {
+        fragColor = vec4(color, alphaValue);
+    }
+}
\ No newline at end of file
@@ -0,0 +1,20 @@
+#version 330
+
+in vec3 in_vert;    // Shared cross glyph vertex
+in vec3 in_offset;  // Per-instance point position
+in float in_state;  // Per-instance state (-1 = hidden, 0 = normal, 1 = hovered, 2 = selected)
+
+uniform mat4 matrix; // Camera matrix
+
+flat out int v_state;
+
+void main() {
+    gl_Position = matrix * vec4(in_vert + in_offset, 1.0);
+
+    if (in_state < 0.0) {
+        // Hidden points are moved outside of the clip volume
+        gl_Position = vec4(0.0, 0.0, 2.0, 1.0);
+    }
+
+    v_state = int(in_state);
+}
\ No newline at end of file
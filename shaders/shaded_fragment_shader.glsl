@@ -0,0 +1,16 @@
+#version 330
+
+in vec3 normal;
+
+out vec4 fragColor;
+uniform vec3 color;
+uniform float alphaValue = 1.0;
+uniform vec3 lightDirection = vec3(-0.4, 0.4, 0.82); // World space, towards the light
+uniform float ambient = 0.35;
+
+void main() {
+    // Two sided Lambert shading, surfaces are lit the same from above and below
+    float diffuse = abs(dot(normalize(normal), normalize(lightDirection)));
+
+    fragColor = vec4(color * (ambient + (1.0 - ambient) * diffuse), alphaValue);
+}
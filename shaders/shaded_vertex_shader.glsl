@@ -0,0 +1,14 @@
+#version 330
+
+in vec3 in_vert;
+in vec3 in_normal;
+
+uniform mat4 matrix; // Camera matrix
+
+out vec3 normal;
+
+void main() {
+    normal = in_normal;
+
+    gl_Position = matrix * vec4(in_vert, 1.0);
+}
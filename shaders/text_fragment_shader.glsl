@@ -0,0 +1,21 @@
+#version 330
+
+in vec2 v_uv;
+
+out vec4 fragColor;
+uniform sampler2D atlas;
+uniform vec3 color;
+uniform float alphaValue = 1.0;
+
+void main() {
+    // The glyph edge sits at 0.5, smooth over one screen pixel so text stays crisp at any zoom
+    float distance = texture(atlas, v_uv).r;
+    float width = fwidth(distance);
+    float alpha = smoothstep(0.5 - width, 0.5 + width, distance);
+
+    if (alpha <= 0.0) {
+        discard;
+    }
+
+    fragColor = vec4(color, alphaValue * alpha);
+}
\ No newline at end of file
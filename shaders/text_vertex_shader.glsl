@@ -0,0 +1,18 @@
+#version 330
+
+in vec2 in_corner;   // Shared unit quad corner
+in vec3 in_pos;      // Per-character quad origin (top left)
+in vec3 in_axis_x;   // Per-character quad width vector
+in vec3 in_axis_y;   // Per-character quad height vector
+in vec4 in_uv;       // Per-character atlas rectangle (u0, v0, u1, v1)
+
+uniform mat4 matrix; // Camera matrix
+
+out vec2 v_uv;
+
+void main() {
+    vec3 position = in_pos + in_corner.x * in_axis_x + in_corner.y * in_axis_y;
+    gl_Position = matrix * vec4(position, 1.0);
+
+    v_uv = mix(in_uv.xy, in_uv.zw, in_corner);
+}
\ No newline at end of file
@@ -2,6 +2,7 @@ from src._imports import *
 from src.errors.standard_error import DOT39StandardError
 from src.framework.items.base_item import BaseItem
 from src.framework.scene.functions import hexToRGB
+from src.framework.scene.spatial_index import ScreenSpaceIndex
 from scipy.special import fresnel
 
 
@@ -78,11 +79,35 @@ class AlignmentItem(BaseItem):
         self._horizontal_path = AlignmentHorizontalPath()
         self._vertical_path = QPainterPath()
         self._draw_calls = []
-        self.vbo = self.createVbo()
+        self._vertices = None
+        self.vbo = None
+        self.createVbo()
 
     def createVbo(self):
-        if not self._horizontal_path.isEmpty():
-            polygons = self._horizontal_path.toSubpathPolygons()
+        """
+        Starts tessellating copies of the paths on a worker thread, the buffer is replaced once they are uploaded
+        """
+        horizontal_path, vertical_path = QPainterPath(self._horizontal_path), QPainterPath(self._vertical_path)
+
+        self.scene().meshBuilder().submit(self, 'path', lambda: self.createVertices(horizontal_path, vertical_path),
+                                          self.uploadVertices)
+
+    def uploadVertices(self, vertices: np.ndarray or None):
+        self._vertices = vertices
+
+        self.scene().releaseBuffer(self.vbo)
+        self.vbo = self.ctx.buffer(vertices) if vertices is not None else None
+
+        # The box only exists once the background tessellation lands, added before that the alignment was left
+        # out of the scene bounds, so drop the cached boxes and have the scene merge the new one
+        self.invalidateBoundingBox()
+        self.scene().itemBoundsChanged(self)
+        self.scene().markSceneDirty()
+
+    @staticmethod
+    def createVertices(horizontal_path: QPainterPath, vertical_path: QPainterPath) -> np.ndarray or None:
+        if not horizontal_path.isEmpty():
+            polygons = horizontal_path.toSubpathPolygons()
 
             # Extract vertex data
             vertices = []
@@ -91,14 +116,14 @@ class AlignmentItem(BaseItem):
                     vertices.append(point.x())
                     vertices.append(point.y())
 
-                    if not self._vertical_path.isEmpty():
-                        for pg in self._vertical_path.toSubpathPolygons():
+                    if not vertical_path.isEmpty():
+                        for pg in vertical_path.toSubpathPolygons():
                             for p in pg:
                                 vertices.append(p.y())
                     else:
                         vertices.append(0)
 
-            return self.ctx.buffer(np.array(vertices, dtype='f4'))
+            return np.array(vertices, dtype='f4')
 
         return None
 
@@ -161,27 +186,54 @@ class AlignmentItem(BaseItem):
         super().render()
 
         if color:
-            self.program['color'].value = (color[0], color[1], color[2])
-            self.program['alphaValue'].value = color[3]
+            uniforms = {'color': color[:3], 'alphaValue': color[3]}
 
-        else:
-            # Render points
-            current_color = self.color()
-            if self.isSelected():
-                self.program['color'].value = hexToRGB('#007fff')
+        elif self.isSelected():
+            uniforms = {'color': hexToRGB('#007fff'), 'alphaValue': 1.0}
 
-            elif self.isHovered():
-                self.program['color'].value = hexToRGB('#0058b2')
+        elif self.isHovered():
+            uniforms = {'color': hexToRGB('#0058b2'), 'alphaValue': 1.0}
 
-            else:
-                self.program['color'].value = current_color
+        else:
+            uniforms = {'color': self.color(), 'alphaValue': 1.0}
 
+        # Alignments sharing a color are merged into one draw
         if self.vbo:
-            vao = self.ctx.simple_vertex_array(self.program, self.vbo, 'in_vert')
-            vao.render(GL.LINE_STRIP)
+            self.scene().renderQueue().submit(self.program, [(self.vbo, '3f', 'in_vert')], GL.LINE_STRIP, uniforms,
+                                              mergeable=True)
+
+    def renderId(self, item_id: int):
+        if not self.vbo:
+            return
+
+        program = self.scene().pickingProgram()
+        program['itemId'].value = item_id
+
+        # The primitive id is the index of the segment along the path
+        self.scene().vertexArray(program, [(self.vbo, '3f', 'in_vert')]).render(GL.LINE_STRIP)
+
+    def pickGeometry(self):
+        vertices = self._vertices
+
+        if vertices is None or len(vertices) < 6:
+            return None
+
+        # One segment per consecutive vertex pair, matching the LINE_STRIP primitive ids
+        vertices = vertices[:len(vertices) // 3 * 3].reshape(-1, 3)
+        return ScreenSpaceIndex.PrimitiveSegments, np.stack([vertices[:-1], vertices[1:]], axis=1)
+
+    def calculateBoundingBox(self) -> np.ndarray or None:
+        vertices = self._vertices
+
+        if vertices is None or len(vertices) < 3:
+            return None
+
+        vertices = vertices[:len(vertices) // 3 * 3].reshape(-1, 3)
+        return np.array([vertices.min(axis=0), vertices.max(axis=0)])
 
     def update(self):
-        self.vbo = self.createVbo()
+        # The previous path stays on screen until the new one is uploaded
+        self.createVbo()
 
     def generateFillets(self, speed_mph: int) -> AlignmentHorizontalPath:
         new_path = self.horizontalPath()
@@ -1,6 +1,7 @@
 from src._imports import *
 from src.framework.items.base_item import *
 from src.framework.scene.functions import hexToRGB
+from src.framework.scene.text_mesh import TextMesh
 from itertools import chain
 
 
@@ -21,6 +22,7 @@ class AxisItem(BaseItem):
         self._x_text_vbo = self.createTextVbo('x', AxisItem.XAxis)
         self._y_text_vbo = self.createTextVbo('y', AxisItem.YAxis)
         self._z_text_vbo = self.createTextVbo('z', AxisItem.ZAxis)
+        self._text_instance_vbo = None
 
     def createXVbo(self):
         vertices = [
@@ -47,58 +49,71 @@ class AxisItem(BaseItem):
         return self.ctx.buffer(np.array(vertices, dtype='f4'))
 
     def createTextVbo(self, text: str, axis: int):
-        font = QFont('Arial', 8)
+        outline = TextMesh.instance('Arial', 8).lineVertices(text)
+        x, y = outline[:, 0], outline[:, 1]
 
-        path = QPainterPath()
-        path.addText(QPointF(0, 0), font, text)
+        # Extract vertex data
+        vertices = np.empty((len(outline), 3), dtype='f4')
+        if axis == AxisItem.XAxis:
+            vertices[:, 0], vertices[:, 1], vertices[:, 2] = x - 7, -y + 1, 0
 
-        # Convert the path to polygons
-        polygons = path.toSubpathPolygons()
+        elif axis == AxisItem.YAxis:
+            vertices[:, 0], vertices[:, 1], vertices[:, 2] = x + 1, -y - 7, 0
 
-        # Extract vertex data
-        vertices = []
-        for polygon in polygons:
-            for point in polygon:
-                if axis == AxisItem.XAxis:
-                    vertices.extend([point.x() - 7, -point.y() + 1, 0])
+        elif axis == AxisItem.ZAxis:
+            vertices[:, 0], vertices[:, 1], vertices[:, 2] = -x - 1, 0, y - 1
 
-                elif axis == AxisItem.YAxis:
-                    vertices.extend([point.x() + 1, -point.y() - 7, 0])
+        # Keep the break in the drawing sequence on every component
+        vertices[np.isnan(x)] = float('nan')
 
-                elif axis == AxisItem.ZAxis:
-                    vertices.extend([-point.x() - 1, 0, point.y() - 1])
+        return self.ctx.buffer(vertices.tobytes())
 
-            # Add a break in the drawing sequence
-            vertices.append(float('nan'))
-            vertices.append(float('nan'))
-            vertices.append(float('nan'))
+    def createTextInstanceVbo(self):
+        text_mesh = TextMesh.instance('Arial', 8)
+        renderer = self.scene().textRenderer()
 
-        return self.ctx.buffer(np.array(vertices, dtype='f4'))
+        # All three letters share one instance buffer, each quad carries its own orientation
+        instances = np.concatenate([
+            renderer.createInstances(['x'], 0, (-7, 1, 0), 1, text_mesh=text_mesh),
+            renderer.createInstances(['y'], 0, (1, -7, 0), 1, text_mesh=text_mesh),
+            renderer.createInstances(['z'], 0, (-1, 0, -1), 1, right=(-1, 0, 0), down=(0, 0, 1),
+                                     text_mesh=text_mesh),
+        ])
+
+        return self.ctx.buffer(instances.tobytes())
 
     def render(self, color=None):
         super().render()
 
-        og = self.ctx.line_width
-        self.ctx.line_width = 1.5
+        queue = self.scene().renderQueue()
 
-        self.program['color'].value = hexToRGB('#fe2e4e')
-        self.ctx.simple_vertex_array(self.program, self._x_vbo, 'in_vert').render(GL.LINES)
+        queue.submit(self.program, [(self._x_vbo, '3f', 'in_vert')], GL.LINES,
+                     {'color': hexToRGB('#fe2e4e'), 'alphaValue': 1.0}, line_width=1.5)
+        queue.submit(self.program, [(self._y_vbo, '3f', 'in_vert')], GL.LINES,
+                     {'color': hexToRGB('#399e19'), 'alphaValue': 1.0}, line_width=1.5)
+        queue.submit(self.program, [(self._z_vbo, '3f', 'in_vert')], GL.LINES,
+                     {'color': hexToRGB('#2883ef'), 'alphaValue': 1.0}, line_width=1.5)
 
-        self.program['color'].value = hexToRGB('#399e19')
-        self.ctx.simple_vertex_array(self.program, self._y_vbo, 'in_vert').render(GL.LINES)
+        if self.scene().isSdfTextEnabled():
+            if self._text_instance_vbo is None:
+                self._text_instance_vbo = self.createTextInstanceVbo()
 
-        self.program['color'].value = hexToRGB('#2883ef')
-        self.ctx.simple_vertex_array(self.program, self._z_vbo, 'in_vert').render(GL.LINES)
+            self.scene().textRenderer().render(self._text_instance_vbo, hexToRGB('#ffffff'),
+                                               TextMesh.instance('Arial', 8))
+            return
 
-        self.ctx.line_width = 1.25
-        self.program['color'].value = hexToRGB('#ffffff')
-        self.ctx.simple_vertex_array(self.program, self._x_text_vbo, 'in_vert').render(GL.LINE_LOOP)
-        self.ctx.simple_vertex_array(self.program, self._y_text_vbo, 'in_vert').render(GL.LINE_LOOP)
-        self.ctx.simple_vertex_array(self.program, self._z_text_vbo, 'in_vert').render(GL.LINE_LOOP)
-
-        self.ctx.line_width = og
+        # The three letters share their state and are merged into one draw
+        for vbo in [self._x_text_vbo, self._y_text_vbo, self._z_text_vbo]:
+            queue.submit(self.program, [(vbo, '3f', 'in_vert')], GL.LINE_LOOP,
+                         {'color': hexToRGB('#ffffff'), 'alphaValue': 1.0}, line_width=1.25, mergeable=True)
 
     def update(self):
+        for vbo in [self._x_vbo, self._y_vbo, self._z_vbo, self._x_text_vbo, self._y_text_vbo, self._z_text_vbo,
+                    self._text_instance_vbo]:
+            self.scene().releaseBuffer(vbo)
+
+        self._text_instance_vbo = None
+
         self._x_vbo = self.createXVbo()
         self._y_vbo = self.createYVbo()
         self._z_vbo = self.createZVbo()
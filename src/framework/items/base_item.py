@@ -11,6 +11,10 @@ class BaseItem(object):
         self._is_selectable = True
         self._selected = False
         self._hovered = False
+        self._bounding_box = None
+        self._bounding_box_valid = False
+        self._view_bounding_box = None
+        self._view_bounding_box_valid = False
 
     def name(self):
         return self._name
@@ -22,15 +26,20 @@ class BaseItem(object):
         self._color = color
 
     def setSelected(self, s: bool):
-        if self._is_selectable:
+        if self._is_selectable and s != self._selected:
             self._selected = s
 
+            self._scene.itemStateChanged(self)
+
     def setHovered(self, hovered: bool):
         self._hovered = hovered
 
     def setVisible(self, v: bool):
         self._visible = v
 
+        self._scene.itemStateChanged(self)
+        self._scene.markSceneDirty()
+
     def isSelected(self):
         return self._selected
 
@@ -49,6 +58,8 @@ class BaseItem(object):
     def setPos(self, pos: list[float]):
         self._pos = pos
 
+        self.invalidateBoundingBox()
+
     def pos(self):
         return [self._pos[0], self._pos[1], self._pos[2]]
 
@@ -71,5 +82,53 @@ class BaseItem(object):
         if not self._visible:
             return
 
+    def renderId(self, item_id: int):
+        # Draws the item into the picking framebuffer with the scene's picking program
+        pass
+
+    def boundingBox(self) -> np.ndarray or None:
+        """
+        Returns the cached (2, 3) array of world space min and max corners of the item's
+        geometry, used for the scene bounds. None if the item doesn't contribute to them
+        """
+        if not self._bounding_box_valid:
+            self._bounding_box = self.calculateBoundingBox()
+            self._bounding_box_valid = True
+
+        return self._bounding_box
+
+    def viewBoundingBox(self) -> np.ndarray or None:
+        """
+        Returns the cached box around everything the item draws (labels included), used
+        for culling. None if the item is never culled
+        """
+        if not self._view_bounding_box_valid:
+            self._view_bounding_box = self.calculateViewBoundingBox()
+            self._view_bounding_box_valid = True
+
+        return self._view_bounding_box
+
+    def calculateBoundingBox(self) -> np.ndarray or None:
+        return None
+
+    def calculateViewBoundingBox(self) -> np.ndarray or None:
+        return self.boundingBox()
+
+    def invalidateBoundingBox(self):
+        self._bounding_box_valid = False
+        self._view_bounding_box_valid = False
+
+        self._scene.itemBoundsChanged(self)
+
+    def pickGeometry(self):
+        # Returns (ScreenSpaceIndex primitive kind, world space primitives) for CPU picking, or None
+        return None
+
+    def buffers(self) -> list[GL.Buffer]:
+        """
+        Returns the GL buffers the item currently draws from
+        """
+        return [value for value in vars(self).values() if isinstance(value, GL.Buffer)]
+
     def update(self):
         pass
@@ -2,6 +2,8 @@ from src._imports import *
 from src.gui.dialogs import EditValueDialog
 from src.framework.items.base_item import *
 from src.framework.scene.functions import hexToRGB
+from src.framework.scene.spatial_index import ScreenSpaceIndex
+from src.framework.scene.text_mesh import TextMesh
 
 
 class EditableItem(BaseItem):
@@ -19,33 +21,46 @@ class EditableItem(BaseItem):
 
         self.program = program
         self.ctx = scene.ctx
-        self.vbo = self.createVbo()
+        self.vbo = None
+        self.instance_vbo = None
+        self.createText()
+
+    def createText(self):
+        # Only build the text for the active text mode, the other is created on demand
+        if self.scene().isSdfTextEnabled():
+            self.instance_vbo = self.createInstanceVbo()
+
+        else:
+            self.vbo = self.createVbo()
 
     def createVbo(self):
-        font_id = QFontDatabase.addApplicationFont('resources/fonts/Simplex.ttf')
-        font_families = QFontDatabase.applicationFontFamilies(font_id)
-        font = QFont(font_families[0], 10)
+        vertices = self.createVertices()
+
+        if vertices is None:
+            return None
+
+        return self.ctx.buffer(vertices.tobytes())
 
-        path = QPainterPath()
-        path.addText(QPointF(0, 0), font, f'{self._value}')
+    def createVertices(self) -> np.ndarray or None:
+        # Assemble the text from cached glyph outlines
+        outline = TextMesh.instance().lineVertices(f'{self._value}')
 
-        # Convert the path to polygons
-        polygons = path.toSubpathPolygons()
+        if not len(outline):
+            return None
 
         # Extract vertex data
-        vertices = []
-        for polygon in polygons:
-            for point in polygon:
-                vertices.append((point.x() * 0.1) + self.x())
-                vertices.append((-point.y() * 0.1) + self.y())
-                vertices.append(100000)  # Letters only visible when facing top down
+        vertices = np.empty((len(outline), 3), dtype='f4')
+        vertices[:, 0] = (outline[:, 0] * 0.1) + self.x()
+        vertices[:, 1] = (-outline[:, 1] * 0.1) + self.y()
+        vertices[:, 2] = np.where(np.isnan(outline[:, 0]), np.nan, 100000)  # Letters only visible when facing top down
 
-            # Add a break in the drawing sequence
-            vertices.append(float('nan'))
-            vertices.append(float('nan'))
-            vertices.append(float('nan'))
+        return vertices
 
-        return self.ctx.buffer(np.array(vertices, dtype='f4'))
+    def createInstanceVbo(self):
+        return self.scene().textRenderer().createInstanceBuffer([f'{self._value}'],
+                                                                0,
+                                                                origin=(self.x(), self.y(), 100000),
+                                                                scale=0.1)
 
     def value(self):
         return self._value
@@ -70,27 +85,72 @@ class EditableItem(BaseItem):
     def render(self, color=None):
         super().render()
 
-        def set_color(color_value):
-            self.program['color'].value = color_value[:3]
-            self.program['alphaValue'].value = color_value[3]
+        if self.scene().isSdfTextEnabled():
+            if self.instance_vbo is None:
+                self.instance_vbo = self.createInstanceVbo()
+
+            if not color:
+                color = hexToRGB('#007fff') if self.isSelected() else (
+                    hexToRGB('#0058b2') if self.isHovered() else self.color()
+                )
+
+            self.scene().textRenderer().render(self.instance_vbo, color)
+            return
+
+        if self.vbo is None:
+            self.vbo = self.createVbo()
+
+        if not self.vbo:
+            return
 
         if color:
-            set_color(color)
+            uniforms = {'color': color[:3], 'alphaValue': color[3]}
+        elif self.isSelected():
+            uniforms = {'color': hexToRGB('#007fff'), 'alphaValue': 1.0}
+        elif self.isHovered():
+            uniforms = {'color': hexToRGB('#0058b2'), 'alphaValue': 1.0}
         else:
-            current_color = self.color()
-            if self.isSelected():
-                self.program['color'].value = hexToRGB('#007fff')
-            elif self.isHovered():
-                self.program['color'].value = hexToRGB('#0058b2')
-            else:
-                self.program['color'].value = current_color
+            uniforms = {'color': self.color(), 'alphaValue': 1.0}
+
+        # Every subpath of the outline ends with a NaN break, so it can be merged with other text
+        self.scene().renderQueue().submit(self.program, [(self.vbo, '3f', 'in_vert')], GL.LINE_LOOP, uniforms,
+                                          line_width=1.5, mergeable=True)
+
+    def renderId(self, item_id: int):
+        # The outline is used for picking in both text modes
+        if self.vbo is None:
+            self.vbo = self.createVbo()
+
+        if not self.vbo:
+            return
+
+        program = self.scene().pickingProgram()
+        program['itemId'].value = item_id
+
+        self.scene().vertexArray(program, [(self.vbo, '3f', 'in_vert')]).render(GL.LINE_LOOP)
+
+    def pickGeometry(self):
+        vertices = self.createVertices()
+
+        if vertices is None or len(vertices) < 2:
+            return None
+
+        # Pairs spanning a NaN subpath break can't be projected and drop out of the index
+        return ScreenSpaceIndex.PrimitiveSegments, np.stack([vertices[:-1], vertices[1:]], axis=1)
 
-        og = self.ctx.line_width
-        self.ctx.line_width = 1.5
+    def calculateViewBoundingBox(self) -> np.ndarray or None:
+        # Annotations are drawn but don't count towards the scene extents
+        vertices = self.createVertices()
 
-        self.ctx.simple_vertex_array(self.program, self.vbo, 'in_vert').render(GL.LINE_LOOP)
+        if vertices is None or np.isnan(vertices[:, 0]).all():
+            return None
 
-        self.ctx.line_width = og
+        return np.array([np.nanmin(vertices, axis=0), np.nanmax(vertices, axis=0)])
 
     def update(self):
-        self.vbo = self.createVbo()
+        self.invalidateBoundingBox()
+        self.scene().releaseBuffer(self.vbo)
+        self.scene().releaseBuffer(self.instance_vbo)
+        self.vbo = None
+        self.instance_vbo = None
+        self.createText()
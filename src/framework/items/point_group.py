@@ -1,51 +1,531 @@
 from src._imports import *
 from src.framework.items.base_item import BaseItem
 from src.framework.items.point_item import PointItem
+from src.framework.items.point_store import PointStore
 from src.framework.scene.functions import hexToRGB
+from src.framework.scene.spatial_index import ScreenSpaceIndex
+from src.framework.scene.text_mesh import TextMesh
 
 
 class PointGroupItem(BaseItem):
-    def __init__(self, scene, points: list[PointItem], name=''):
+    StateHidden = -1
+    StateNormal = 0
+    StateHovered = 1
+    StateSelected = 2
+    LabelSlack = 0.25
+    ClusterCellPixels = 8
+    ClusterMinimumPoints = 256
+    ClusterMaximumRatio = 0.75  # Below this many clusters per visible point clustering isn't worth it
+    LabelMinimumPixels = 5
+
+    def __init__(self, scene, store: PointStore, name=''):
         super().__init__(scene, name)
         self._color = hexToRGB('#ff0000')
-        self._points = points
+        self._store = store
+
+        self.ctx = scene.ctx
+        self.program = scene.pointShaderProgram()
+        self.label_program = scene.shaderProgram()
+        self.glyph_vbo = self.createGlyphVbo()
+        self.instance_vbo = self.createInstanceVbo()
+        self.state_vbo = self.createStateVbo()
+        self.text_vbo = None
+        self.text_instance_vbo = None
+        self._text_slots = None
+        self._text_instance_slots = None
+        self._dirty_points = set()
+        self._cluster_bucket = None
+        self._cluster_indices = None
+        self.cluster_vbo = None
+        self.cluster_state_vbo = None
+        self.createLabels()
+
+    def createGlyphVbo(self):
+        # One cross glyph shared by every point in the group, offset per instance on the GPU
+        vertices = [
+            # Horizontal line
+            -1.0, 0.0, 0.0,
+            1.0, 0.0, 0.0,
+            # Vertical line
+            0.0, -1.0, 0.0,
+            0.0, 1.0, 0.0,
+        ]
+
+        return self.ctx.buffer(np.array(vertices, dtype='f4'))
+
+    def createInstanceVbo(self):
+        if not len(self._store):
+            return None
+
+        return self.ctx.buffer(self._store.positions().astype('f4').tobytes())
+
+    def createStateVbo(self):
+        if not len(self._store):
+            return None
+
+        return self.ctx.buffer(self.pointStates().tobytes())
+
+    def pointStates(self, indices=slice(None)) -> np.ndarray:
+        """
+        Returns the per-instance selection/hover state of the points (every point by default)
+        """
+        flags = self._store.flags()[indices]
+        states = np.full(len(flags), PointGroupItem.StateNormal, dtype='f4')
+        states[(flags & PointStore.FlagHovered) != 0] = PointGroupItem.StateHovered
+        states[(flags & PointStore.FlagSelected) != 0] = PointGroupItem.StateSelected
+        states[(flags & PointStore.FlagVisible) == 0] = PointGroupItem.StateHidden
+
+        return states
+
+    def labelIndices(self) -> np.ndarray:
+        """
+        Returns the indices of the visible points that have a description to label
+        """
+        return np.flatnonzero((self._store.descriptionCodes() != 0) & self._store.flagged(PointStore.FlagVisible))
+
+    def labelLines(self, index: int) -> list[str]:
+        # Define the text with newlines
+        x, y, _ = self._store.position(index)
+
+        return [
+            f'{self._store.description(index)}',
+            f'X: {x}',
+            f'Y: {y}'
+        ]
+
+    def createLabels(self):
+        # Only build the labels for the active text mode, the other is created on demand
+        if self.scene().isSdfTextEnabled():
+            self.text_instance_vbo = self.createTextInstanceVbo()
+
+        else:
+            self.requestTextVbo()
+
+    @staticmethod
+    def labelCapacity(length: int) -> int:
+        # Leave room in every label slot so edits that change a few characters can be written in place
+        return length + int(length * PointGroupItem.LabelSlack) + 8
+
+    def labelSlots(self, indices: np.ndarray, lengths: list[int],
+                   count: int = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Packs one slot per label and returns the buffer row each point's slot starts at
+        (-1 without a label), the slot capacities and the packed start of each label
+        """
+        count = len(self._store) if count is None else count
+        capacities = np.array([self.labelCapacity(length) for length in lengths], dtype='i8')
+        starts = np.zeros(len(capacities), dtype='i8')
+        starts[1:] = np.cumsum(capacities)[:-1]
+
+        point_starts = np.full(count, -1, dtype='i8')
+        point_starts[indices] = starts
+        point_capacities = np.zeros(count, dtype='i8')
+        point_capacities[indices] = capacities
+
+        return point_starts, point_capacities, starts
+
+    @staticmethod
+    def labelVertices(outline: np.ndarray, origins: np.ndarray) -> np.ndarray:
+        # Extract vertex data
+        vertices = np.empty((len(outline), 3), dtype='f4')
+        vertices[:, 0] = (outline[:, 0] * 0.1) + (origins[..., 0] + 0.5)
+        vertices[:, 1] = (-outline[:, 1] * 0.1) + (origins[..., 1] - 2)
+        vertices[:, 2] = np.where(np.isnan(outline[:, 0]), np.nan, 100000)  # Letters only visible when facing top down
+
+        return vertices
+
+    def labelOutline(self, index: int) -> np.ndarray:
+        text_mesh = TextMesh.instance()
+        outline = text_mesh.textVertices(self.labelLines(index), text_mesh.font().pointSize() + 5)
+
+        return self.labelVertices(outline, self._store.positions()[index, :2])
+
+    def labelInstances(self, index: int) -> np.ndarray:
+        text_mesh = TextMesh.instance()
+        x, y, _ = self._store.position(index)
+
+        return self.scene().textRenderer().createInstances(self.labelLines(index),
+                                                           text_mesh.font().pointSize() + 5,
+                                                           origin=(x + 0.5, y - 2, 100000), scale=0.1)
+
+    def requestTextVbo(self):
+        """
+        Starts assembling the label outlines on a worker thread, text_vbo is replaced once they are uploaded
+        """
+        builder = self.scene().meshBuilder()
+
+        if builder.isPending(self, 'labels'):
+            return
+
+        indices = self.labelIndices()
+
+        if not len(indices):
+            self.uploadTextVertices((None, None))
+            return
+
+        # Glyphs are outlined through the font on the GUI thread, the worker only reads the caches
+        lines = [self.labelLines(i) for i in indices]
+        TextMesh.instance().cacheGlyphs(''.join(''.join(label) for label in lines))
+
+        line_spacing = TextMesh.instance().font().pointSize() + 5
+        positions = self._store.positions()[indices, :2].copy()
+        count = len(self._store)
+
+        builder.submit(self, 'labels',
+                       lambda: self.createTextVertices(indices, lines, positions, count, line_spacing),
+                       self.uploadTextVertices)
+
+    def createTextVertices(self, indices: np.ndarray, lines: list[list[str]], positions: np.ndarray, count: int,
+                           line_spacing: float) -> tuple[np.ndarray, tuple]:
+        """
+        Returns the label vertices and slots of the points (runs on a worker thread)
+        """
+        text_mesh = TextMesh.instance()
+
+        # Assemble every label in the group from cached glyph outlines into one buffer,
+        # padding each slot with breaks so it can be rewritten in place later
+        outlines = [text_mesh.textVertices(label, line_spacing) for label in lines]
+        point_starts, point_capacities, starts = self.labelSlots(indices, [len(o) for o in outlines], count)
+
+        outline = np.full((int(point_capacities.sum()), 2), np.nan, dtype='f4')
+        for start, o in zip(starts, outlines):
+            outline[start:start + len(o)] = o
+
+        origins = np.repeat(positions, point_capacities[indices], axis=0)
+
+        return self.labelVertices(outline, origins), (point_starts, point_capacities)
+
+    def uploadTextVertices(self, labels: tuple[np.ndarray or None, tuple or None]):
+        vertices, self._text_slots = labels
+
+        self.scene().releaseBuffer(self.text_vbo)
+        self.text_vbo = self.ctx.buffer(vertices.tobytes()) if vertices is not None else None
+
+    def createTextInstanceVbo(self):
+        self._text_instance_slots = None
+        indices = self.labelIndices()
+
+        if not len(indices):
+            return None
+
+        # Empty slot space is filled with zero sized quads
+        pieces = [self.labelInstances(i) for i in indices]
+        point_starts, point_capacities, starts = self.labelSlots(indices, [len(p) for p in pieces])
+
+        instances = np.zeros((int(point_capacities.sum()), 13), dtype='f4')
+        for start, piece in zip(starts, pieces):
+            instances[start:start + len(piece)] = piece
+
+        self._text_instance_slots = (point_starts, point_capacities)
+
+        return self.ctx.buffer(instances.tobytes())
 
     def color(self):
         return self._color
 
+    def store(self) -> PointStore:
+        return self._store
+
+    def point(self, index: int) -> PointItem:
+        return PointItem(self, index)
+
     def points(self) -> list[PointItem]:
-        return self._points
+        return [PointItem(self, i) for i in range(len(self._store))]
 
     def setColor(self, color: tuple[float, float, float]):
-        for point in self.points():
-            point.setColor(color)
-
         self._color = color
 
-    def setPoints(self, points: list[PointItem]):
-        self._points = points
+    def setStore(self, store: PointStore):
+        self._store = store
+
+        self.update()
 
     def setSelected(self, s: bool):
+        if s == self.isSelected():
+            return
+
         super().setSelected(s)
+        self._store.setFlag(PointStore.FlagSelected, s)
 
-        for item in self.points():
-            item.setSelected(s)
+        self.updateStates()
 
     def setHovered(self, hovered: bool):
+        if hovered == self.isHovered():
+            return
+
         super().setHovered(hovered)
+        self._store.setFlag(PointStore.FlagHovered, hovered)
+
+        self.updateStates()
+
+    def updateStates(self):
+        if self.state_vbo:
+            self.state_vbo.write(self.pointStates().tobytes())
+
+        if self.cluster_state_vbo:
+            self.cluster_state_vbo.write(self.pointStates(self._cluster_indices).tobytes())
+
+    def markPointsDirty(self, indices):
+        """
+        Marks points whose attributes changed, only their ranges are rewritten on the next render
+        """
+        self._dirty_points.update(int(i) for i in indices)
+        self.invalidateBoundingBox()
+        self.invalidateClusters()
+
+    @staticmethod
+    def dirtyRanges(indices: np.ndarray) -> list[tuple[int, int]]:
+        """
+        Splits sorted point indices into contiguous (start, stop) ranges
+        """
+        breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+
+        return [(int(run[0]), int(run[-1]) + 1) for run in np.split(indices, breaks)]
 
-        for item in self.points():
-            item.setHovered(hovered)
+    def flushDirtyPoints(self):
+        """
+        Writes the modified points into the existing group buffers with offset writes
+        """
+        if not self._dirty_points:
+            return
+
+        indices = np.array(sorted(self._dirty_points), dtype='i8')
+        self._dirty_points.clear()
+
+        if self.instance_vbo:
+            for start, stop in self.dirtyRanges(indices):
+                self.instance_vbo.write(self._store.positions()[start:stop].astype('f4').tobytes(), offset=start * 12)
+                self.state_vbo.write(self.pointStates(slice(start, stop)).tobytes(), offset=start * 4)
+
+        # Labels that no longer fit in their slot (or gained/lost a description) rebuild their buffer,
+        # the current one stays on screen until the rebuilt labels are uploaded
+        builder = self.scene().meshBuilder()
+
+        if builder.isPending(self, 'labels'):
+            builder.cancel(self, 'labels')
+            self.requestTextVbo()
+
+        elif self.text_vbo and not self.writeLabelSlots(self.text_vbo, self._text_slots, indices,
+                                                        self.labelOutline, float('nan')):
+            self.requestTextVbo()
+
+        if self.text_instance_vbo and not self.writeLabelSlots(self.text_instance_vbo, self._text_instance_slots,
+                                                               indices, self.labelInstances, 0.0):
+            self.scene().releaseBuffer(self.text_instance_vbo)
+            self.text_instance_vbo = None
+
+    @staticmethod
+    def zoomBucket(units_per_pixel: float) -> int:
+        # Clusters only change when the pixel size crosses a power of two
+        return int(math.floor(math.log2(max(units_per_pixel, 1e-12))))
+
+    def clusterIndices(self, cell_size: float) -> np.ndarray:
+        """
+        Bins the visible points into a grid of the cell size and returns one representative
+        point per occupied cell, preferring selected and hovered points
+        """
+        visible = np.flatnonzero(self._store.flagged(PointStore.FlagVisible))
+        visible = visible[np.argsort(-self.pointStates(visible), kind='stable')]
+
+        cells = np.floor(self._store.positions()[visible, :2] / cell_size).astype('i8')
+        _, first = np.unique(cells, axis=0, return_index=True)
+
+        return np.sort(visible[first])
+
+    def clusterBuffers(self, units_per_pixel: float) -> tuple[GL.Buffer, GL.Buffer, int]:
+        """
+        Returns the instance and state buffers to draw at the zoom level with their instance count,
+        regrouping the points only when the zoom moves into a different bucket
+        """
+        if len(self._store) < PointGroupItem.ClusterMinimumPoints:
+            return self.instance_vbo, self.state_vbo, len(self._store)
+
+        bucket = self.zoomBucket(units_per_pixel)
+
+        if bucket != self._cluster_bucket:
+            self.invalidateClusters()
+            self._cluster_bucket = bucket
+
+            indices = self.clusterIndices(PointGroupItem.ClusterCellPixels * 2.0 ** bucket)
+
+            if len(indices) < len(self._store) * PointGroupItem.ClusterMaximumRatio:
+                self._cluster_indices = indices
+                self.cluster_vbo = self.ctx.buffer(self._store.positions()[indices].astype('f4').tobytes())
+                self.cluster_state_vbo = self.ctx.buffer(self.pointStates(indices).tobytes())
+
+        if self.cluster_vbo:
+            return self.cluster_vbo, self.cluster_state_vbo, len(self._cluster_indices)
+
+        return self.instance_vbo, self.state_vbo, len(self._store)
+
+    def invalidateClusters(self):
+        self.scene().releaseBuffer(self.cluster_vbo)
+        self.scene().releaseBuffer(self.cluster_state_vbo)
+        self.cluster_vbo = None
+        self.cluster_state_vbo = None
+        self._cluster_indices = None
+        self._cluster_bucket = None
+
+    def labelsVisible(self, units_per_pixel: float) -> bool:
+        # Labels shorter than a few pixels are unreadable, skip them entirely
+        line_height = (TextMesh.instance().font().pointSize() + 5) * 0.1
+
+        return line_height / units_per_pixel >= PointGroupItem.LabelMinimumPixels
+
+    def writeLabelSlots(self, buffer: GL.Buffer, slots: tuple, indices: np.ndarray, create_piece, fill) -> bool:
+        """
+        Rewrites the label slots of the points in place, returns False if the buffer must be rebuilt
+        """
+        point_starts, point_capacities = slots
+        store = self._store
+        labelled = (store.descriptionCodes()[indices] != 0) & store.flagged(PointStore.FlagVisible)[indices]
+
+        for index, has_label in zip(indices, labelled):
+            if has_label != (point_starts[index] >= 0):
+                return False
+
+            if not has_label:
+                continue
+
+            piece = create_piece(index)
+            capacity = point_capacities[index]
+
+            if len(piece) > capacity:
+                return False
+
+            padded = np.full((capacity, piece.shape[1]), fill, dtype='f4')
+            padded[:len(piece)] = piece
+            buffer.write(padded.tobytes(), offset=int(point_starts[index]) * piece.shape[1] * 4)
+
+        self.scene().bufferWritten(buffer)
+
+        return True
 
     def render(self, color=None):
-        for item in self.points():
-            item.render(color)
+        super().render()
 
-    def hover(self):
-        for item in self.points():
-            item.hover()
+        self.flushDirtyPoints()
+
+        if not self.instance_vbo:
+            return
+
+        if color:
+            uniforms = {'color': color[:3], 'hoveredColor': color[:3], 'selectedColor': color[:3],
+                        'alphaValue': color[3]}
+
+        else:
+            uniforms = {'color': self.color(), 'hoveredColor': hexToRGB('#0058b2'),
+                        'selectedColor': hexToRGB('#007fff'), 'alphaValue': 1.0}
+
+        # Zoomed out, only one representative cross per screen cell is drawn
+        units_per_pixel = self.scene().camera.worldUnitsPerPixel()
+        instance_vbo, state_vbo, count = self.clusterBuffers(units_per_pixel)
+
+        # Draw every cross in the group with a single instanced call
+        self.scene().renderQueue().submit(self.program, [
+            (self.glyph_vbo, '3f', 'in_vert'),
+            (instance_vbo, '3f/i', 'in_offset'),
+            (state_vbo, '1f/i', 'in_state'),
+        ], GL.LINES, uniforms, instances=count)
+
+        if self.labelsVisible(units_per_pixel):
+            self.renderLabels(color)
+
+    def renderLabels(self, color=None):
+        label_color = color if color else (
+            hexToRGB('#007fff') if self.isSelected() else (
+                hexToRGB('#0058b2') if self.isHovered() else hexToRGB('#c800ff')
+            )
+        )
+
+        if self.scene().isSdfTextEnabled():
+            if self.text_instance_vbo is None:
+                self.text_instance_vbo = self.createTextInstanceVbo()
+
+            self.scene().textRenderer().render(self.text_instance_vbo, label_color)
+            return
+
+        if self.text_vbo is None:
+            self.requestTextVbo()
+
+        if not self.text_vbo:
+            return
+
+        # Every label in the group is one packet, merged with the labels of other groups in the same color
+        self.scene().renderQueue().submit(self.label_program, [(self.text_vbo, '3f', 'in_vert')], GL.LINE_LOOP,
+                                          {'color': label_color[:3], 'alphaValue': color[3] if color else 1.0},
+                                          line_width=1.5, mergeable=True)
+
+    def renderId(self, item_id: int):
+        self.flushDirtyPoints()
+
+        if not self.instance_vbo:
+            return
+
+        program = self.scene().pointPickingProgram()
+        program['itemId'].value = item_id
+
+        # The element id is the index of the point in the store
+        vao = self.scene().vertexArray(program, [
+            (self.glyph_vbo, '3f', 'in_vert'),
+            (self.instance_vbo, '3f/i', 'in_offset'),
+            (self.state_vbo, '1f/i', 'in_state'),
+        ])
+        vao.render(GL.LINES, instances=len(self._store))
+
+    def labelExtent(self) -> tuple[float, float]:
+        """
+        Returns a conservative world space width and height of a label, measured from its point
+        """
+        text_mesh = TextMesh.instance()
+        line_spacing = text_mesh.font().pointSize() + 5
+
+        # Coordinate lines rarely run past 24 characters, descriptions come from the table
+        characters = max([24] + [len(description) for description in self._store.descriptionTable()])
+
+        return 0.5 + characters * text_mesh.advance('W') * 0.1, 2 + 3 * line_spacing * 0.1
+
+    def calculateBoundingBox(self) -> np.ndarray or None:
+        if not len(self._store):
+            return None
+
+        positions = self._store.positions()
+        return np.array([positions.min(axis=0), positions.max(axis=0)])
+
+    def calculateViewBoundingBox(self) -> np.ndarray or None:
+        if self.boundingBox() is None:
+            return None
+
+        box = self.boundingBox().copy()
+
+        # Labels hang off to the right of and below their points, drawn at a fixed elevation
+        if len(self.labelIndices()):
+            width, height = self.labelExtent()
+            box[1, 0] += width
+            box[0, 1] -= height
+            box[1, 2] = max(box[1, 2], 100000)
+
+        return box
+
+    def pickGeometry(self):
+        # Hidden points project to NaN so they never enter the index
+        positions = self._store.positions().copy()
+        positions[~self._store.flagged(PointStore.FlagVisible)] = np.nan
+
+        return ScreenSpaceIndex.PrimitivePoints, positions
 
     def update(self):
-        for point in self.points():
-            point.update()
+        self.invalidateBoundingBox()
+        self.invalidateClusters()
+        self._dirty_points.clear()
+
+        for vbo in [self.instance_vbo, self.state_vbo, self.text_vbo, self.text_instance_vbo]:
+            self.scene().releaseBuffer(vbo)
 
+        self.instance_vbo = self.createInstanceVbo()
+        self.state_vbo = self.createStateVbo()
+        self.text_vbo = None
+        self.text_instance_vbo = None
+        self._text_slots = None
+        self.scene().meshBuilder().cancel(self, 'labels')
+        self.createLabels()
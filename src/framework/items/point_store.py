@@ -0,0 +1,115 @@
+from src._imports import *
+from src.errors.pnezd_data_error import DOT39PNEZDDataError
+
+
+class PointStore(object):
+    """
+    Columnar storage for a group of survey points. Every attribute lives in a NumPy
+    array so a group costs a few dozen bytes per point and bulk operations stay vectorized
+    """
+    FlagVisible = 1
+    FlagSelected = 2
+    FlagHovered = 4
+
+    def __init__(self, numbers=(), positions=(), descriptions=()):
+        # Point numbers are free text in PNEZD files (101, A101, CP-3), kept as interned strings
+        numbers = [sys.intern(f'{n}') for n in numbers]
+        self._numbers = np.empty(len(numbers), dtype=object)
+        self._numbers[:] = numbers
+
+        self._positions = np.array(positions, dtype='f8').reshape(-1, 3)
+
+        # Descriptions repeat heavily in survey data (CL, EP, TP...) so they are interned, code 0 is empty
+        self._descriptions = ['']
+        self._description_codes = {'': 0}
+        self._codes = np.zeros(len(self._positions), dtype='i4')
+
+        for i, description in enumerate(descriptions):
+            self._codes[i] = self.internDescription(description)
+
+        self._flags = np.full(len(self._positions), PointStore.FlagVisible, dtype='u1')
+
+        if len(self._numbers) != len(self._positions):
+            raise DOT39PNEZDDataError()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def internDescription(self, description: str) -> int:
+        """
+        Returns the code for the description, adding it to the description table if it is new
+        """
+        description = f'{description}'
+        code = self._description_codes.get(description)
+
+        if code is None:
+            code = len(self._descriptions)
+            self._descriptions.append(description)
+            self._description_codes[description] = code
+
+        return code
+
+    def numbers(self) -> np.ndarray:
+        return self._numbers
+
+    def positions(self) -> np.ndarray:
+        return self._positions
+
+    def eastings(self) -> np.ndarray:
+        return self._positions[:, 0]
+
+    def northings(self) -> np.ndarray:
+        return self._positions[:, 1]
+
+    def elevations(self) -> np.ndarray:
+        return self._positions[:, 2]
+
+    def descriptionCodes(self) -> np.ndarray:
+        return self._codes
+
+    def descriptionTable(self) -> list[str]:
+        return self._descriptions
+
+    def flags(self) -> np.ndarray:
+        return self._flags
+
+    def number(self, index: int) -> str:
+        return self._numbers[index]
+
+    def position(self, index: int) -> list[float]:
+        return self._positions[index].tolist()
+
+    def description(self, index: int) -> str:
+        return self._descriptions[self._codes[index]]
+
+    def setNumber(self, index: int, number):
+        self._numbers[index] = sys.intern(f'{number}')
+
+    def setPosition(self, index: int, pos: list[float]):
+        self._positions[index] = pos
+
+    def setDescription(self, index: int, description: str):
+        self._codes[index] = self.internDescription(description)
+
+    def hasFlag(self, index: int, flag: int) -> bool:
+        return bool(self._flags[index] & flag)
+
+    def setFlag(self, flag: int, enabled: bool, indices=None):
+        """
+        Sets or clears a flag on the given point indices (every point if no indices are given)
+        """
+        target = slice(None) if indices is None else indices
+
+        if enabled:
+            self._flags[target] |= flag
+        else:
+            self._flags[target] &= ~np.uint8(flag)
+
+    def flagged(self, flag: int) -> np.ndarray:
+        """
+        Returns a boolean mask of the points with the flag set
+        """
+        return (self._flags & flag) != 0
+
+    def nbytes(self) -> int:
+        return self._numbers.nbytes + self._positions.nbytes + self._codes.nbytes + self._flags.nbytes
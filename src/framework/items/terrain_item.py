@@ -3,10 +3,20 @@ from src.errors.standard_error import DOT39StandardError
 from src.framework.items.base_item import BaseItem
 from src.framework.items.point_item import PointItem
 from src.framework.scene.functions import hexToRGB
+from src.framework.scene.spatial_index import ScreenSpaceIndex
+from src.framework.scene.triangulation_cache import TriangulationCache
+from src.framework.scene.terrain_contours import TerrainContours
 from scipy.spatial import Delaunay
 
 
 class TerrainItem(BaseItem):
+    LodMinimumPoints = 20000
+    LodErrorFractions = (0.08, 0.02, 0.005, 0.001)  # Coarse to fine, of the surface's vertical range
+    LodPixelError = 1.0
+    ContourMinorInterval = 1.0
+    ContourMajorInterval = 5.0
+    ContourLift = 0.0025  # Of the surface's extent, raises the contours above it so they win the depth test
+
     def __init__(self, scene, program, points: list[tuple[float, float, float]] = [(0.0, 0.0, 0.0)], name=''):
         super().__init__(scene, name)
         self.setColor(hexToRGB('#00ff00'))
@@ -14,16 +24,30 @@ class TerrainItem(BaseItem):
 
         self.program = program
         self.ctx = scene.ctx
-        self.vbo = self.createVbo()
+        self.vbo = None
+        self.normal_vbo = None
+        self.ibo = None
+        self.tri = None
+        self._lod_levels = None
+        self._lod_buffers = {}
+        self.contour_vbo = None
+        self._contours = None
+        self._contour_major_vertices = 0
+        self._contour_intervals = scene.contourIntervals()  # New surfaces follow the scene's contour settings
+        self._contours_visible = scene.contoursVisible()
 
-        # Prepare Delaunay triangulation
+        # The Delaunay triangulation and the buffers are built in the background
         self._points_np = np.array(self._points, dtype='f4')
         self._points_2d = self._points_np[:, :2]
-        self.tri = Delaunay(self._points_2d)
+        self.createVbo()
 
     def points(self):
         return self._points
 
+    def pointArray(self) -> np.ndarray:
+        # The points as an (n, 3) float32 array, shared, don't modify it
+        return self._points_np
+
     def fromPointItems(self, point_items: list[PointItem]):
         points = []
 
@@ -37,71 +61,357 @@ class TerrainItem(BaseItem):
 
         self.update()
 
+    def triangulation(self) -> Delaunay:
+        """
+        Returns the triangulation of the current points, taking it from the cache when the
+        background build hasn't delivered it yet
+        """
+        if self.tri is not None and not self.scene().meshBuilder().isPending(self, 'mesh'):
+            return self.tri
+
+        return TriangulationCache.triangulate(self._points_np)
+
     def getElevationAt(self, x, y):
-        # Find the simplex (triangle) containing the point (x, y)
-        simplex = self.tri.find_simplex([x, y])
+        elevation = self.getElevationsAt(np.array([[x, y]]))[0]
 
-        if simplex == -1:
-            return None
+        return None if np.isnan(elevation) else float(elevation)
 
-        # Get the indices of the vertices of the triangle
-        triangle_vertices = self.tri.simplices[simplex]
+    def getElevationsAt(self, xy: np.ndarray) -> np.ndarray:
+        """
+        Returns the surface elevation at each of the (n, 2) x, y locations, NaN outside the surface
+        """
+        xy = np.asarray(xy, dtype='f8').reshape(-1, 2)
+        tri = self.triangulation()
 
-        # Extract the 3 points of the triangle
-        p0, p1, p2 = self._points_np[triangle_vertices]
+        # Locate every location in one pass, then interpolate inside the triangles that were hit
+        simplices = tri.find_simplex(xy)
+        inside = simplices >= 0
 
-        # Calculate the barycentric coordinates (lambda1, lambda2, lambda3) of the point (x, y) within the triangle
-        # These are calculated using the inverse of the matrix formed by the triangle's points and the point (x, y)
-        denom = (p1[1] - p2[1]) * (p0[0] - p2[0]) + (p2[0] - p1[0]) * (p0[1] - p2[1])
-        if denom == 0:
-            return None
+        elevations = np.full(len(xy), np.nan)
+        elevations[inside] = self.interpolate(tri, self._points_np[:, 2], xy[inside], simplices[inside])
 
-        lambda1 = ((p1[1] - p2[1]) * (x - p2[0]) + (p2[0] - p1[0]) * (y - p2[1])) / denom
-        lambda2 = ((p2[1] - p0[1]) * (x - p2[0]) + (p0[0] - p2[0]) * (y - p2[1])) / denom
-        lambda3 = 1 - lambda1 - lambda2
+        return elevations
 
-        # Calculate the elevation (z-value) using the barycentric coordinates
-        elevation = lambda1 * p0[2] + lambda2 * p1[2] + lambda3 * p2[2]
+    @staticmethod
+    def interpolate(tri: Delaunay, z: np.ndarray, xy: np.ndarray, simplices: np.ndarray) -> np.ndarray:
+        """
+        Interpolates the vertex values z at the locations inside the given simplices, using the
+        triangulation's precomputed barycentric transforms
+        """
+        transform = tri.transform[simplices]
+        b = np.einsum('nij,nj->ni', transform[:, :2], xy - transform[:, 2])
+        weights = np.c_[b, 1.0 - b.sum(axis=1)]
 
-        return elevation
+        return (weights * z.astype('f8')[tri.simplices[simplices]]).sum(axis=1)
 
     def createVbo(self):
+        """
+        Starts triangulating the points on a worker thread, the surface is drawn once the mesh is uploaded
+        """
         if len(self.points()) < 3:
             raise DOT39StandardError('Not enough points to create a surface (minimum of 3 required)')
 
-        # Convert points to a numpy array
-        points = np.array(self.points(), dtype='f4')
-        points_2d = points[:, :2]
+        points = self._points_np
+        self.scene().meshBuilder().submit(self, 'mesh', lambda: self.createMesh(points), self.uploadMesh)
+
+    @staticmethod
+    def createMesh(points: np.ndarray) -> tuple[Delaunay, tuple]:
+        """
+        Triangulates the points, returns the triangulation and its indexed mesh arrays (runs on a worker thread).
+        The one triangulation is shared by rendering, picking and elevation queries
+        """
+        tri = TriangulationCache.triangulate(points)
+
+        return tri, TerrainItem.meshArrays(points, tri.simplices)
+
+    @staticmethod
+    def meshArrays(points: np.ndarray, simplices: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the shared vertices, their normals and the triangle indices of an indexed mesh
+        """
+        return (points.astype('f4'), TerrainItem.vertexNormals(points, simplices),
+                np.ascontiguousarray(simplices, dtype='u4'))
+
+    @staticmethod
+    def vertexNormals(points: np.ndarray, simplices: np.ndarray) -> np.ndarray:
+        """
+        Returns the unit normal of every point, the area weighted average of the faces around it
+        """
+        p0, p1, p2 = (points[simplices[:, i]].astype('f8') for i in range(3))
+        faces = np.cross(p1 - p0, p2 - p0)  # Length is twice the triangle area
+
+        # Triangles come in either winding from the 2D triangulation, point them all upwards
+        faces[faces[:, 2] < 0] *= -1
+
+        indices = simplices.ravel()
+        normals = np.empty((len(points), 3))
+        for axis in range(3):
+            normals[:, axis] = np.bincount(indices, weights=np.repeat(faces[:, axis], 3), minlength=len(points))
+
+        # Points outside every triangle (duplicates) are given an upward normal
+        lengths = np.linalg.norm(normals, axis=1)
+        normals[lengths == 0] = (0.0, 0.0, 1.0)
+        lengths[lengths == 0] = 1.0
+
+        return (normals / lengths[:, None]).astype('f4')
+
+    def createBuffers(self, arrays: tuple[np.ndarray, ...]) -> tuple[GL.Buffer, GL.Buffer, GL.Buffer]:
+        return tuple(self.ctx.buffer(array.tobytes()) for array in arrays)
+
+    def uploadMesh(self, mesh: tuple[Delaunay, tuple]):
+        self.tri, arrays = mesh
+
+        for buffer in [self.vbo, self.normal_vbo, self.ibo]:
+            self.scene().releaseBuffer(buffer)
+
+        self.vbo, self.normal_vbo, self.ibo = self.createBuffers(arrays)
+        self.releaseLodLevels()
+
+        if len(self._points_np) >= TerrainItem.LodMinimumPoints:
+            points, tri = self._points_np, self.tri
+            self.scene().meshBuilder().submit(self, 'lod', lambda: self.createLodLevels(points, tri),
+                                              self.uploadLodLevels)
+
+        self.createContours()
+
+        # The triangles are what both picking modes hit
+        self.scene().markSceneDirty()
+
+    def createContours(self):
+        """
+        Starts contouring the current triangulation on a worker thread
+        """
+        if self.tri is None:
+            return
+
+        if not self._contours_visible:
+            # Drop the now stale contours, setContoursVisible() rebuilds them when they are shown again
+            self.scene().meshBuilder().cancel(self, 'contours')
+            self.scene().releaseBuffer(self.contour_vbo)
+            self.contour_vbo = None
+            self._contours = None
+            self._contour_major_vertices = 0
+            return
+
+        points, simplices = self._points_np, self.tri.simplices
+        minor, major = self._contour_intervals
+        lift = TerrainItem.ContourLift * float(np.linalg.norm(np.ptp(points, axis=0)))
+
+        def build():
+            contours = TerrainContours.create(points, simplices, minor, major)
+            return (contours, *contours.lineVertices(lift))
+
+        self.scene().meshBuilder().submit(self, 'contours', build, self.uploadContours)
+
+    def uploadContours(self, result: tuple[TerrainContours, np.ndarray, int]):
+        self._contours, vertices, self._contour_major_vertices = result
+
+        self.scene().releaseBuffer(self.contour_vbo)
+        self.contour_vbo = self.ctx.buffer(vertices.tobytes()) if len(vertices) else None
+
+    def contours(self) -> TerrainContours or None:
+        """
+        Returns the stitched contour polylines, None until they have been built
+        """
+        return self._contours
+
+    def setContourIntervals(self, minor: float, major: float):
+        """
+        Sets the elevation step between contours and between the major (emphasized) ones
+        """
+        if minor <= 0 or major <= 0:
+            raise DOT39StandardError('Contour intervals must be greater than zero')
+
+        self._contour_intervals = (minor, major)
+        self.createContours()
+
+        self.scene().markSceneDirty()
+        self.scene().update()
+
+    def contourIntervals(self) -> tuple[float, float]:
+        return self._contour_intervals
+
+    def setContoursVisible(self, visible: bool):
+        self._contours_visible = visible
+
+        if visible and self._contours is None:
+            self.createContours()
+
+        self.scene().markSceneDirty()
+        self.scene().update()
+
+    def contoursVisible(self) -> bool:
+        return self._contours_visible
+
+    @staticmethod
+    def createLodLevels(points: np.ndarray, tri: Delaunay) -> list[tuple[float, tuple]]:
+        """
+        Builds the level of detail pyramid, coarse to fine, as (max vertical error, indexed mesh arrays)
+        pairs by greedily inserting the points furthest from each simplified surface (runs on a worker thread)
+        """
+        points = points.astype('f8')
 
-        tri = Delaunay(points_2d)
-        triangles = points[tri.simplices]
-        vertices = triangles.reshape(-1, 3).astype('f4')
+        if len(points) < TerrainItem.LodMinimumPoints:
+            return []
 
-        # Create the VBO
-        return self.ctx.buffer(vertices.tobytes())
+        z_range = np.ptp(points[:, 2])
+        subset = np.unique(tri.convex_hull)  # Every point must fall inside the coarsest mesh
+        levels = []
+
+        for fraction in TerrainItem.LodErrorFractions:
+            subset, tri, error = TerrainItem.refineSubset(points, subset, fraction * z_range)
+
+            # Past this point a level doesn't save enough to be worth its memory
+            if len(subset) > len(points) // 2:
+                break
+
+            levels.append((error, TerrainItem.meshArrays(points[subset], tri.simplices)))
+
+        return levels
+
+    @staticmethod
+    def refineSubset(points: np.ndarray, subset: np.ndarray, tolerance: float) -> tuple[np.ndarray, Delaunay, float]:
+        """
+        Adds the worst point of every triangle whose vertical error exceeds the tolerance until
+        the simplified surface is within it. Returns the subset, its triangulation and its max error
+        """
+        while True:
+            tri = Delaunay(points[subset, :2])
+
+            rest = np.ones(len(points), dtype=bool)
+            rest[subset] = False
+            rest = np.flatnonzero(rest)
+
+            simplices = tri.find_simplex(points[rest, :2])
+            inside = simplices >= 0
+            rest, simplices = rest[inside], simplices[inside]
+
+            # Interpolate the simplified surface under each remaining point with barycentric coordinates
+            z = TerrainItem.interpolate(tri, points[subset, 2], points[rest, :2], simplices)
+            error = np.abs(points[rest, 2] - z)
+
+            worst = float(error.max()) if len(error) else 0.0
+            if worst <= tolerance:
+                return subset, tri, worst
+
+            # The first entry per triangle after sorting by triangle then descending error is its worst point
+            order = np.lexsort((-error, simplices))
+            first = order[np.r_[True, simplices[order][1:] != simplices[order][:-1]]]
+            first = first[error[first] > tolerance]
+
+            subset = np.concatenate([subset, rest[first]])
+
+    def uploadLodLevels(self, levels: list[tuple[float, tuple]]):
+        self.releaseLodLevels()
+        self._lod_levels = levels
+
+    def releaseLodLevels(self):
+        for buffers in self._lod_buffers.values():
+            for buffer in buffers:
+                self.scene().releaseBuffer(buffer)
+
+        self._lod_levels = None
+        self._lod_buffers = {}
+
+    def buffers(self) -> list[GL.Buffer]:
+        return super().buffers() + [buffer for buffers in self._lod_buffers.values() for buffer in buffers]
+
+    def lodBuffers(self) -> tuple[GL.Buffer, GL.Buffer, GL.Buffer]:
+        """
+        Returns the vertex, normal and index buffers of the coarsest level whose error stays
+        under LodPixelError on screen, the full mesh until the levels have been built
+        """
+        if not self._lod_levels:
+            return self.vbo, self.normal_vbo, self.ibo
+
+        units_per_pixel = self.scene().camera.worldUnitsPerPixel()
+
+        for i, (error, arrays) in enumerate(self._lod_levels):
+            if error / units_per_pixel <= TerrainItem.LodPixelError:
+                if i not in self._lod_buffers:
+                    self._lod_buffers[i] = self.createBuffers(arrays)
+
+                return self._lod_buffers[i]
+
+        return self.vbo, self.normal_vbo, self.ibo
 
     def render(self, color=None):
         super().render()
 
+        if not self.vbo:
+            return
+
         if color:
-            self.program['color'].value = (color[0], color[1], color[2])
-            self.program['alphaValue'].value = color[3]
+            uniforms = {'color': color[:3], 'alphaValue': color[3]}
+
+        elif self.isSelected():
+            uniforms = {'color': hexToRGB('#007fff'), 'alphaValue': 1.0}
+
+        elif self.isHovered():
+            uniforms = {'color': hexToRGB('#0058b2'), 'alphaValue': 1.0}
 
         else:
-            current_color = self.color()
-            if self.isSelected():
-                self.program['color'].value = hexToRGB('#007fff')
+            uniforms = {'color': self.color(), 'alphaValue': 1.0}
+
+        vbo, normal_vbo, ibo = self.lodBuffers()
+
+        # Solid mode lights the surface with its vertex normals
+        if self.scene().isWireframe():
+            self.scene().renderQueue().submit(self.program, [(vbo, '3f', 'in_vert')], GL.TRIANGLES, uniforms,
+                                              index_buffer=ibo)
+
+        else:
+            self.scene().renderQueue().submit(self.scene().shadedShaderProgram(), [
+                (vbo, '3f', 'in_vert'),
+                (normal_vbo, '3f', 'in_normal'),
+            ], GL.TRIANGLES, uniforms, index_buffer=ibo)
+
+        if self._contours_visible and self.contour_vbo:
+            self.renderContours(color)
 
-            elif self.isHovered():
-                self.program['color'].value = hexToRGB('#0058b2')
+    def renderContours(self, color=None):
+        # One buffer holds every contour, majors first, drawn as two ranges with their own style
+        content = [(self.contour_vbo, '3f', 'in_vert')]
+        alpha = color[3] if color else 1.0
 
-            else:
-                self.program['color'].value = current_color
+        if self._contour_major_vertices:
+            self.scene().renderQueue().submit(self.program, content, GL.LINE_STRIP, {
+                'color': color[:3] if color else hexToRGB('#d2a56e'), 'alphaValue': alpha,
+            }, line_width=2.0, vertices=self._contour_major_vertices)
 
-        self.ctx.simple_vertex_array(self.program, self.vbo, 'in_vert').render(GL.TRIANGLES)
+        minor_vertices = self.contour_vbo.size // 12 - self._contour_major_vertices
+
+        if minor_vertices:
+            self.scene().renderQueue().submit(self.program, content, GL.LINE_STRIP, {
+                'color': color[:3] if color else hexToRGB('#8c6e4b'), 'alphaValue': alpha,
+            }, line_width=1.0, first=self._contour_major_vertices, vertices=minor_vertices)
+
+    def renderId(self, item_id: int):
+        if not self.vbo:
+            return
+
+        program = self.scene().pickingProgram()
+        program['itemId'].value = item_id
+
+        # The primitive id is the index of the triangle in self.tri.simplices, so always use full detail
+        self.scene().vertexArray(program, [(self.vbo, '3f', 'in_vert')], self.ibo).render(GL.TRIANGLES)
+
+    def pickGeometry(self):
+        # Element ids are triangle indices in self.tri.simplices, same as the GPU picking pass
+        if self.tri is None:
+            return None
+
+        return ScreenSpaceIndex.PrimitiveTriangles, self._points_np[self.tri.simplices]
+
+    def calculateBoundingBox(self) -> np.ndarray or None:
+        return np.array([self._points_np.min(axis=0), self._points_np.max(axis=0)])
 
     def update(self):
+        self.invalidateBoundingBox()
         self._points_np = np.array(self._points, dtype='f4')
         self._points_2d = self._points_np[:, :2]
-        self.tri = Delaunay(self._points_2d)
-        self.vbo = self.createVbo()
+
+        # The previous mesh stays on screen until the new one is uploaded
+        self.scene().meshBuilder().cancel(self, 'lod')
+        self.scene().meshBuilder().cancel(self, 'contours')
+        self.createVbo()
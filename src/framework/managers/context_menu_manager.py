@@ -1,5 +1,6 @@
 from src._imports import *
 from src.gui.widgets import ContextMenu
+from src.gui.dialogs import ExportImageDialog
 from src.framework.items.point_group import PointGroupItem
 from src.framework.items.terrain_item import TerrainItem
 from src.framework.items.alignment_item import AlignmentItem
@@ -58,6 +59,8 @@ class ContextMenuManager(object):
         clear_selection_action.triggered.connect(self.scene.selectionTool().clearSelection)
         hide_selection_action = QAction('Hide Selection', menu)
         hide_selection_action.triggered.connect(self.scene.selectionTool().hideSelection)
+        export_image_action = QAction('Export Image...', menu)
+        export_image_action.triggered.connect(self.exportImage)
 
         menu.addSeparator()
         menu.addAction(select_all_action)
@@ -65,3 +68,8 @@ class ContextMenuManager(object):
         menu.addSeparator()
         menu.addAction(clear_selection_action)
         menu.addAction(hide_selection_action)
+        menu.addSeparator()
+        menu.addAction(export_image_action)
+
+    def exportImage(self):
+        ExportImageDialog(self.scene, self.parent).exec()
@@ -2,7 +2,7 @@ from src._imports import *
 from src.gui.dialogs import GetPointGroupDialog, EditPointGroupDialog
 from src.framework.scene.functions import isConvertibleToFloat
 from src.framework.items.point_group import PointGroupItem
-from src.framework.items.point_item import PointItem
+from src.framework.items.point_store import PointStore
 from src.framework.items.terrain_item import TerrainItem
 from src.framework.scene.undo_commands import *
 from src.errors.pnezd_data_error import DOT39PNEZDDataError
@@ -58,8 +58,6 @@ class PointManager:
             except:
                 raise DOT39PNEZDDataError()
 
-            print(points, sep='\n')
-
             self.parent().point_group_count += 1
             self.processPoints(points)
 
@@ -103,14 +101,14 @@ class PointManager:
         except:
             raise DOT39PNEZDDataError()
 
-        print(points, sep='\n')
-
         self.parent().point_group_count += 1
         self.processPoints(points)
 
     def processPoints(self, points: list[dict]):
         if points:
-            point_items = []
+            numbers = []
+            positions = []
+            descriptions = []
 
             for point_dict in points:
                 # Extract the values in order as a list
@@ -123,13 +121,11 @@ class PointManager:
                 elevation = float(values[3])
                 description = values[4] if len(values) > 4 else ''
 
-                item = PointItem(self.parent().glScene(),
-                                 point_number,
-                                 [easting, northing, elevation],
-                                 name=f'{description}')
-                point_items.append(item)
+                numbers.append(point_number)
+                positions.append([easting, northing, elevation])
+                descriptions.append(description)
 
-            point_group = PointGroupItem(self.parent().scene, point_items,
+            point_group = PointGroupItem(self.parent().scene, PointStore(numbers, positions, descriptions),
                                          name=f'Point Item Group #{self.parent().point_group_count}')
             self.parent().glScene().addUndoCommand(AddItemCommand(point_group, self.parent().glScene()))
             self.parent().glScene().sceneCamera().reset()
@@ -151,10 +147,7 @@ class PointManager:
         if point_group:
             self.parent().terrain_item_count += 1
 
-            points = []
-
-            for item in point_group.points():
-                points.append((item.x(), item.y(), item.z()))
+            points = [tuple(p) for p in point_group.store().positions().tolist()]
 
             surface_item = TerrainItem(self.parent().glScene(),
                                        self.parent().glScene().shaderProgram(),
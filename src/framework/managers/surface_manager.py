@@ -3,7 +3,7 @@ from src.gui.dialogs import GetTerrainDialog
 from src.framework.scene.functions import isConvertibleToFloat
 from src.framework.scene.undo_commands import *
 from src.framework.items.terrain_item import TerrainItem
-from src.framework.items.point_item import PointItem
+from src.framework.items.point_store import PointStore
 from src.framework.items.point_group import PointGroupItem
 from src.errors.pnezd_data_error import DOT39PNEZDDataError
 
@@ -87,17 +87,13 @@ class SurfaceManager:
             self.parent().terrain_item_count -= 1
             self.parent().point_group_count += 1
 
-            points = []
-
-            for point_num, point in enumerate(terrain_item.points()):
-                item = PointItem(self.parent().glScene(),
-                                 f'{point_num + 1}',
-                                 pos=[*point],
-                                 name=f'POINT #{point_num + 1}')
-                points.append(item)
+            point_count = len(terrain_item.points())
+            store = PointStore(range(1, point_count + 1),
+                               terrain_item.points(),
+                               [f'POINT #{point_num + 1}' for point_num in range(point_count)])
 
             point_group_item = PointGroupItem(self.parent().glScene(),
-                                              points,
+                                              store,
                                               f'Point Item Group #{self.parent().point_group_count}')
 
             self.parent().glScene().addUndoCommand(SurfaceToPointsCommand(point_group_item,
@@ -6,56 +6,81 @@ from src.framework.items.terrain_item import TerrainItem
 from src.framework.items.alignment_item import AlignmentItem
 from src.framework.items.editable_item import EditableItem
 from src.framework.items.axis_item import AxisItem
-from src.framework.scene.functions import hexToRGB, vertex_shad, fragment_shad
-from src.framework.scene.camera import Camera
+from src.framework.scene.scene_core import SceneCore
+from src.framework.scene.spatial_index import ScreenSpaceIndex
+from src.framework.scene.tiled_export import TiledExporter
+from src.framework.scene.metrics import metrics
 from src.framework.scene.undo_commands import *
 from src.framework.managers.context_menu_manager import ContextMenuManager
 from src.framework.managers.tool_manager import ToolManager
 from src.framework.tools.selection_tool import SelectionTool
+import contextlib
 
 
-class BaseScene(QGLWidget):
+class BaseScene(QGLWidget, SceneCore):
+    PickRadius = 3
+    PickingRefreshDelay = 100
+    PickingReadbackDelay = 16  # About a frame, after which mapping the pixel buffer no longer stalls
+    PickingModeGpu = 0
+    PickingModeCpu = 1
+    MaximumFrameRate = 60
+
     def __init__(self, parent):
+        # Repaint scheduling, update() only requests a frame and the requests are coalesced into one paint
+        self._frame_timer = None
+        self._frame_start = 0.0
+        self._frame_ms = 0.0
+        self._update_requests = 0
+        self._update_batch_depth = 0
+
         format = QGLFormat()
         format.setSamples(4)
         super(BaseScene, self).__init__(format, parent)
         self.setMouseTracking(True)
         self.setCursor(Qt.CursorShape.CrossCursor)
 
+        self.initScene()
+
         # Public
         self.undo_stack = QUndoStack(self)
         self.undo_stack.setUndoLimit(200)
-        self.ctx = None
-        self.program = None
-        self.bg_color = hexToRGB('#000000')
 
         # Private
-        self._items = []
-        self._wireframe = True
         self._context_menu_manager = ContextMenuManager(self, parent)
         self._tool_manager = ToolManager(self)
         self._selection_tool = SelectionTool(self)
 
-    def initializeGL(self):
-        self.ctx = GL.create_context()
-        self.ctx.clear(*self.bg_color)
-        self.ctx.enable(GL.DEPTH_TEST)
-        self.ctx.wireframe = self.isWireframe()
-        self.ctx.line_width = 3.0
+        # Picking buffer cache, the ID pass is only re-rendered when the scene or camera changes
+        self._picking_key = None
+        self._selection_ids = None
+        self._picking_timer = QTimer(self)
+        self._picking_timer.setSingleShot(True)
+        self._picking_timer.setInterval(BaseScene.PickingRefreshDelay)
+        self._picking_timer.timeout.connect(self._refreshPickingBuffer)
+        self._readback_pending = False
+        self._readback_timer = QTimer(self)
+        self._readback_timer.setSingleShot(True)
+        self._readback_timer.setInterval(BaseScene.PickingReadbackDelay)
+        self._readback_timer.timeout.connect(self._readbackFinished)
+
+        # Screen space index answering picks on the CPU (for software rasterizers where ID passes are slow)
+        self._picking_mode = BaseScene.PickingModeGpu
+        self._spatial_index = ScreenSpaceIndex()
+
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._repaint)
 
-        self.program = self.ctx.program(
-            vertex_shader=vertex_shad,
-            fragment_shader=fragment_shad
-        )
-
-        self.camera = Camera(self)
+    def initializeGL(self):
+        self.initializeContext(GL.create_context())
 
         # Create Selection Framebuffer
-        self.selection_texture = self.ctx.texture((self.width(), self.height()), 4,
-                                                  dtype='i4')  # Integer texture for IDs
-        self.depth_texture = self.ctx.depth_texture((self.width(), self.height()))
-        self.selection_fbo = self.ctx.framebuffer(color_attachments=[self.selection_texture],
-                                                  depth_attachment=self.depth_texture)
+        self.selection_texture = None
+        self.depth_texture = None
+        self.selection_fbo = None
+        self.selection_pbo = None
+        self.selection_zero_pbo = None
+        self._resizeSelectionBuffers(max(2, self.width()), max(2, self.height()))
 
         self.addItem(AxisItem(self))
 
@@ -72,29 +97,90 @@ class BaseScene(QGLWidget):
         self.camera.resize(width, height)
 
         # Resize selection framebuffer
-        self._resizeSelectionBuffers(w, h)
+        self._resizeSelectionBuffers(width, height)
+        self.markSceneDirty()
 
-        # Console Info
-        print(f'OpenGL Viewport Resized To: {width, height}')
+        if metrics.enabled:
+            metrics.record('resize', width=width, height=height)
+
+    def update(self):
+        """
+        Requests a repaint. Requests are coalesced into one frame, issued no faster than
+        MaximumFrameRate and held back entirely while a batchUpdate() block is open
+        """
+        self._update_requests += 1
+
+        if self._update_batch_depth or self._frame_timer is None or self._frame_timer.isActive():
+            return
+
+        # Keep at least one frame interval between the starts of consecutive frames
+        interval = 1000.0 / BaseScene.MaximumFrameRate
+        since_last_frame = (metrics.now() - self._frame_start) * 1000.0
+        self._frame_timer.start(int(max(0.0, interval - since_last_frame)))
+
+    @contextlib.contextmanager
+    def batchUpdate(self):
+        """
+        Defers every repaint requested inside the block to a single one when the outermost block exits
+        """
+        self._update_batch_depth += 1
+
+        try:
+            yield self
+
+        finally:
+            self._update_batch_depth -= 1
+
+            if not self._update_batch_depth and self._update_requests:
+                self._update_requests -= 1
+                self.update()
+
+    def frameTime(self) -> float:
+        """
+        Returns how long the last frame took to draw in milliseconds
+        """
+        return self._frame_ms
+
+    def context(self) -> GL.Context:
+        """
+        Returns the moderngl context for the scene, QGLWidget.context() comes first in the MRO
+        and would return the QGLContext instead
+        """
+        return self.ctx
+
+    def exportImage(self, path: str, width: int, height: int, dpi: float = None) -> bool:
+        """
+        Saves the current view as a width x height PNG, rendered in tiles so it can be far larger than the widget
+        """
+        exported = TiledExporter(self).export(path, width, height, dpi)
+
+        self.update()
+
+        return exported
+
+    def _repaint(self):
+        QGLWidget.update(self)
 
     def paintGL(self):
-        self.ctx.wireframe = self.isWireframe()
-        self.ctx.clear(*self.bg_color)
-        self.ctx.enable_only(GL.DEPTH_TEST | GL.BLEND)
+        frame_start = metrics.now()
+        coalesced = self._update_requests
+        self._frame_start = frame_start
+        self._update_requests = 0
 
-        self.camera.update()
+        if metrics.enabled:
+            self._draw_count = 0
 
-        # Render items
-        for item in self.visibleItems():
-            item.render()
+        visible_items = self.renderScene()
 
-        # Console Info
-        print('---- Repainting OpenGL Viewport ----')
-        print(f'Rendering {len(self.visibleItems())} Items')
-        print('Current Color: ', self.program['color'].value)
-        print('Current Alpha Value: ', self.program['alphaValue'].value)
-        print('Current Zoom Amount: ', self.camera.cameraZoom())
-        print('Current Matrix: ', self.program['matrix'].value)
+        # Refresh the picking buffer once the view has settled
+        if self._picking_mode == BaseScene.PickingModeGpu and self._picking_key != self._pickingKey():
+            self._picking_timer.start()
+
+        self._frame_ms = metrics.elapsedMs(frame_start)
+
+        if metrics.enabled:
+            metrics.record('frame', ms=self._frame_ms, items=len(visible_items), draws=self._draw_count,
+                           zoom=self.camera.cameraZoom(), requests=coalesced)
 
     def mousePressEvent(self, event: QMouseEvent):
         if event.buttons() & Qt.MouseButton.LeftButton:
@@ -133,11 +219,13 @@ class BaseScene(QGLWidget):
             self.camera.reset()
             self.update()
         elif event.button() == Qt.MouseButton.LeftButton:
-            if self.activeSelection() and isinstance(self.activeSelection(), EditableItem):
-                self.activeSelection().startEditing()
-            elif self.activeSelection() and isinstance(self.activeSelection(), PointGroupItem):
+            active_selection = self.activeSelection()
+
+            if isinstance(active_selection, EditableItem):
+                active_selection.startEditing()
+            elif isinstance(active_selection, PointGroupItem):
                 self.parent().pointManager.editPoints()
-            elif self.activeSelection() and isinstance(self.activeSelection(), AlignmentItem):
+            elif isinstance(active_selection, AlignmentItem):
                 self.parent().alignmentManager.editAlignment()
 
     def wheelEvent(self, event: QWheelEvent):
@@ -152,206 +240,231 @@ class BaseScene(QGLWidget):
     def unsetCursor(self):
         self.setCursor(Qt.CursorShape.CrossCursor)
 
-    def itemMeshPoints(self):
+    def itemAt(self, x, y) -> BaseItem or None:
         """
-        Returns a list of all item positions and points
+        Retrieves the item at the specified x, y screen coordinates
         """
+        item, _ = self.pickAt(x, y)
 
-        # Calculate the bounding box of all items
-        mesh_points = []
-
-        for item in self.visibleItems():
-            if isinstance(item, PointGroupItem):
-                for p in item.points():
-                    mesh_points.append(p.pos())
-
-            elif isinstance(item, TerrainItem):
-                for p in item.points():
-                    mesh_points.append([*p])
+        return item
 
-            elif isinstance(item, AlignmentItem):
-                polygons = item.horizontalPath().toSubpathPolygons()
+    def pickAt(self, x, y) -> tuple[BaseItem or None, int]:
+        """
+        Retrieves the item and the element inside it (point index, triangle or segment)
+        at the specified x, y screen coordinates
+        """
+        if metrics.enabled:
+            pick_start = metrics.now()
 
-                for polygon in polygons:
-                    for point in polygon:
-                        mesh_points.append([point.x(), point.y(), 0])
+        if self._picking_mode == BaseScene.PickingModeCpu:
+            result = self._spatialIndex().query(x, y, BaseScene.PickRadius)
 
-            elif isinstance(item, (EditableItem, AxisItem)):
-                continue
+        else:
+            selection_ids = self._selectionIds()
 
+            # Until the ID buffer is current and read back, the CPU index answers without stalling on the GPU
+            if selection_ids is None:
+                result = self._spatialIndex().query(x, y, BaseScene.PickRadius)
             else:
-                mesh_points.append(item.pos())
+                result = self._pickFromSelectionIds(selection_ids, x, self.height() - y - 1)  # Invert Y for OpenGL
 
-        return mesh_points
+        if metrics.enabled:
+            metrics.record('pick', ms=metrics.elapsedMs(pick_start), mode=self._picking_mode, hit=result[0] is not None)
 
-    def addItem(self, item: BaseItem):
+        return result
+
+    def _pickFromSelectionIds(self, selection_ids: np.ndarray, x, y) -> tuple[BaseItem or None, int]:
         """
-        Adds the item to the render que
+        Looks up the pick in the ID buffer, y is in OpenGL coordinates
         """
+        # Look at a small window around the cursor so thin lines and point crosses are easy to hit
+        r = BaseScene.PickRadius
+        x0, y0 = max(0, x - r), max(0, y - r)
+        x1, y1 = min(selection_ids.shape[1], x + r + 1), min(selection_ids.shape[0], y + r + 1)
 
-        if item not in self._items:
-            self._items.append(item)
-
-        print('Item Added')
+        if x1 <= x0 or y1 <= y0:
+            return None, -1
 
-        self.update()
+        return self._closestPick(selection_ids[y0:y1, x0:x1], x - x0, y - y0)
 
-    def removeItem(self, item: BaseItem):
+    def _closestPick(self, ids: np.ndarray, cx: int, cy: int) -> tuple[BaseItem or None, int]:
         """
-        Removes items from the render que
+        Returns the item and element of the hit closest to (cx, cy) inside the id window
         """
-        self._items.remove(item)
+        rows, cols = np.nonzero(ids[:, :, 0])
 
-        print('Item Removed')
+        if not len(rows):
+            return None, -1
 
-        self.update()
+        nearest = np.argmin((rows - cy) ** 2 + (cols - cx) ** 2)
+        object_id, element = ids[rows[nearest], cols[nearest]]
 
-    def items(self) -> list[BaseItem]:
-        """
-        Returns a list of items currently in the render que
-        """
-        return self._items
+        # Find the selected object
+        if 0 < object_id <= len(self.items()):
+            return self.items()[object_id - 1], int(element)  # IDs start at 1
+
+        return None, -1
+
+    def _pickingKey(self) -> tuple[int, int]:
+        return self._scene_version, self.camera.version()
 
-    def visibleItems(self) -> list[BaseItem]:
+    def _refreshPickingBuffer(self):
         """
-        Returns a list of all the visible items on the scene
+        Renders the ID buffer and starts an asynchronous readback into a pixel buffer object
         """
-        l = []
+        if self._picking_key == self._pickingKey():
+            return
 
-        for item in self.items():
-            if item.isVisible():
-                l.append(item)
+        if metrics.enabled:
+            pass_start = metrics.now()
 
-        return l
+        self.makeCurrent()
+        self._renderForSelection()
+        self.selection_fbo.read_into(self.selection_pbo, components=2, alignment=4, dtype='u4')
+        self.ctx.screen.use()
 
-    def selectedItems(self):
-        """
-        Returns a list of all the selected items on the scene
-        """
-        return [item for item in self.visibleItems() if item.isSelected()]
+        self._selection_ids = None
+        self._picking_key = self._pickingKey()
+        self._readback_pending = True
+        self._readback_timer.start()
+
+        if metrics.enabled:
+            metrics.record('picking pass', ms=metrics.elapsedMs(pass_start))
 
-    def activeSelection(self) -> BaseItem or None:
+    def _selectionIds(self) -> np.ndarray or None:
         """
-        Returns the selected item (if there is only one item selected
-        on the scene)
+        Returns the cached (height, width, 2) array of item and element IDs, None while the ID
+        buffer is out of date or its readback is still in flight. Picks never wait on the GPU,
+        a stale buffer is re-rendered on the picking timer instead
         """
-        if self.selectedItems() and len(self.selectedItems()) < 2:
-            return self.selectedItems()[0]
+        if self._picking_key != self._pickingKey():
+            if not self._picking_timer.isActive():
+                self._picking_timer.start()
 
-        return None
+            return None
 
-    def itemAt(self, x, y) -> BaseItem or None:
+        if self._readback_pending:
+            return None
+
+        if self._selection_ids is None:
+            self.makeCurrent()
+            data = self.selection_pbo.read()
+            self._selection_ids = np.frombuffer(data, dtype=np.uint32).reshape(self.selection_texture.height,
+                                                                              self.selection_texture.width, 2)
+
+        return self._selection_ids
+
+    def _readbackFinished(self):
         """
-        Retrieves the item at the specified x, y screen coordinates
+        The readback started by the last ID pass has had a frame to land, mapping it no longer stalls
         """
-        y = self.height() - y - 1  # Invert Y for OpenGL coordinates
-        print('---- Locating Scene Items ----')
-        print(f'X: {x}')
-        print(f'Y: {y}')
-        print('Rendering For Selection')
+        self._readback_pending = False
 
-        # Render to selection framebuffer
-        self._renderForSelection()
+    def _spatialIndex(self) -> ScreenSpaceIndex:
+        """
+        Returns the screen space index, reprojecting the pickable items if the scene,
+        camera or viewport changed since it was last built
+        """
+        key = (*self._pickingKey(), self.width(), self.height())
 
-        # Read the pixel under the cursor
-        pixel_data = self.selection_fbo.read(viewport=(x, y, 1, 1), alignment=4, dtype='i4')
-        color_values = np.frombuffer(pixel_data, dtype=np.float32)[:3]  # Extract RGB
-        object_id = int(color_values[0] * 255)
+        if not self._spatial_index.isValid(key):
+            if metrics.enabled:
+                build_start = metrics.now()
 
-        self.ctx.screen.use()
-        self.update()
+            items = [item for item in self.items() if item.isVisible() and item.isSelectable()]
+            self._spatial_index.rebuild(items, self.camera.matrix(), self.width(), self.height(), key)
 
-        # Find the selected object
-        if 0 < object_id <= len(self.items()):
-            selected_item = self.items()[object_id - 1]  # IDs start at 1
-            return selected_item
+            if metrics.enabled:
+                metrics.record('spatial index', ms=metrics.elapsedMs(build_start), items=len(items))
 
-        return None
+        return self._spatial_index
 
     def _renderForSelection(self):
         """
-        Renders the scene with object IDs into an offscreen framebuffer
+        Renders the scene with 32-bit object and element IDs into an offscreen framebuffer
         """
         self.selection_fbo.use()
-        self.ctx.clear(0, 0, 0, 0)
 
-        # Use a simple shader for selection rendering
+        # A float clear color is undefined on the integer ID attachment, zero it from a buffer of zeros
+        # on the GPU instead and only clear depth through the framebuffer
+        self.selection_texture.write(self.selection_zero_pbo)
+        self.selection_fbo.color_mask = (False, False, False, False)
+        self.ctx.clear(depth=1.0)
+        self.selection_fbo.color_mask = (True, True, True, True)
+        self.ctx.enable_only(GL.DEPTH_TEST)
+
+        in_view = set(self.itemsInView())
+
         for i, item in enumerate(self.items(), start=1):  # IDs start at 1
-            item.render(color=(i / 255.0, 0, 0, 1))
+            if item in in_view and item.isSelectable():
+                item.renderId(i)
 
     def _resizeSelectionBuffers(self, w, h):
         """
         Resizes the selection framebuffer
         """
-        self.selection_texture = self.ctx.texture((w, h), 4, dtype='i4')
+        for resource in [self.selection_fbo, self.selection_texture, self.depth_texture, self.selection_pbo,
+                         self.selection_zero_pbo]:
+            if resource:
+                resource.release()
+
+        self.selection_texture = self.ctx.texture((w, h), 2, dtype='u4')  # Item id + element id
         self.depth_texture = self.ctx.depth_texture((w, h))
         self.selection_fbo = self.ctx.framebuffer(color_attachments=[self.selection_texture],
                                                   depth_attachment=self.depth_texture)
+        self.selection_pbo = self.ctx.buffer(reserve=w * h * 8)
+        self.selection_zero_pbo = self.ctx.buffer(reserve=w * h * 8)
+        self.selection_zero_pbo.clear()
+        self._selection_ids = None
+        self._picking_key = None
+        self._readback_pending = False
 
     def undo(self):
         """
         Triggers an undo on the undo stack
         """
-        self.undo_stack.undo()
-        self.update()
+        with self.batchUpdate():
+            self.undo_stack.undo()
+            self.markSceneDirty()
+            self.update()
 
     def redo(self):
         """
         Triggers a redo on the undo stack
         """
-        self.undo_stack.redo()
-        self.update()
+        with self.batchUpdate():
+            self.undo_stack.redo()
+            self.markSceneDirty()
+            self.update()
 
     def addUndoCommand(self, command: QUndoCommand):
         """
         Adds an undo command to the undo stack
         """
-        self.undo_stack.push(command)
+        with self.batchUpdate():
+            self.undo_stack.push(command)
 
-        print(f'Undo Command: {command}')
+            if metrics.enabled:
+                metrics.record('undo command', type=type(command).__name__)
 
-        self.update()
-
-    def setBackgroundColor(self, color: str):
-        """
-        Sets the background color of the scene to the specified hex value
-        """
-        self.bg_color = hexToRGB(color)
-
-        self.update()
+            self.markSceneDirty()
+            self.update()
 
-    def isWireframe(self):
+    def pickingMode(self) -> int:
         """
-        Returns if the scene is wireframe enabled
+        Returns if picks are answered by the GPU ID buffer or the CPU screen space index
         """
-        return self._wireframe
+        return self._picking_mode
 
-    def setWireframe(self, enabled: bool):
+    def setPickingMode(self, mode: int):
         """
-        Sets the scene to wireframe mode
+        Switches picking between the GPU ID buffer and the CPU screen space index
         """
-        self._wireframe = enabled
+        self._picking_mode = mode
+        self._picking_timer.stop()
 
         self.update()
 
-    def context(self) -> GL.Context:
-        """
-        Returns the OpenGL context for the scene
-        """
-        return self.ctx
-
-    def shaderProgram(self) -> GL.Program:
-        """
-        Returns the OpenGL shader program for the scene
-        """
-        return self.program
-
-    def sceneCamera(self) -> Camera:
-        """
-        Returns the camera class for the scene
-        """
-        return self.camera
-
     def undoStack(self) -> QUndoStack:
         """
         Returns the scene undo stack
@@ -8,7 +8,8 @@ class Camera(object):
     def __init__(self, scene):
         self.scene = scene
 
-        self._view_matrix = self.scene.program['matrix']
+        self._matrix = np.identity(4, dtype='f4')
+        self._version = 0
         self._arc_ball = ArcBallUtil(self.scene.width(), self.scene.height())
         self._center = np.zeros(3)
         self._scale = 1.0
@@ -16,12 +17,17 @@ class Camera(object):
         self._camera_zoom = 1.0
         self._prev_x = 0
         self._prev_y = 0
+        self._tile = None
 
     def update(self):
         """
         Updates the Camera matrix
         """
-        self._aspect_ratio = self.scene.width() / max(1.0, self.scene.height())
+        if self._tile is not None:
+            self._aspect_ratio = self._tile[1]
+
+        else:
+            self._aspect_ratio = self.scene.width() / max(1.0, self.scene.height())
 
         ortho_size = self._camera_zoom
         ortho_left = -self._aspect_ratio * ortho_size
@@ -42,7 +48,18 @@ class Camera(object):
             (0.0, 1.0, 0.0)
         )
         self._arc_ball.Transform[3, :3] = -self._arc_ball.Transform[:3, :3].T @ self._center
-        self._view_matrix.write((orthographic * lookat * self._arc_ball.Transform).astype('f4'))
+        matrix = (orthographic * lookat * self._arc_ball.Transform).astype('f4')
+
+        if self._tile is not None:
+            matrix = (matrix.astype('f8') @ self._tile[0]).astype('f4')
+
+        # Anything cached against the view (e.g. the picking buffer) is keyed on the version
+        if not np.array_equal(matrix, self._matrix):
+            self._matrix = matrix
+            self._version += 1
+
+        for program in self.scene.shaderPrograms():
+            program['matrix'].write(self._matrix)
 
     def resize(self, w, h):
         self._arc_ball.setBounds(w, h)
@@ -52,23 +69,28 @@ class Camera(object):
         Resets the Camera's view and bounding area
         """
         if self.scene.visibleItems():
-            self._arc_ball = ArcBallUtil(self.scene.width(), self.scene.height())
+            bounds = self.scene.sceneBounds()
 
-            if self.scene.itemMeshPoints():
-                mesh_points = self.scene.itemMeshPoints()
-            else:
+            if bounds is None:
                 # nothing on the scene, so we just use the axis item's bounding box
-                mesh_points = [np.zeros(3), [100, 100, 100]]
+                bounds = np.array([np.zeros(3), [100, 100, 100]])
 
-            bounding_box_min = np.min(mesh_points, axis=0)
-            bounding_box_max = np.max(mesh_points, axis=0)
+            self.fitBounds(bounds)
 
-            self._center = 0.5 * (bounding_box_max + bounding_box_min)
-            self._scale = np.linalg.norm(bounding_box_max - self._center)
-            self._arc_ball.Transform[:3, :3] /= self._scale
-            self._arc_ball.Transform[3, :3] = -self._center / self._scale
+    def fitBounds(self, bounds: np.ndarray):
+        """
+        Points the Camera straight down (plan view) at the center of the (2, 3) min/max bounds, zoomed to fit them
+        """
+        self._arc_ball = ArcBallUtil(self.scene.width(), self.scene.height())
+
+        bounding_box_min, bounding_box_max = np.asarray(bounds, dtype='f8')
+
+        self._center = 0.5 * (bounding_box_max + bounding_box_min)
+        self._scale = max(np.linalg.norm(bounding_box_max - self._center), 1e-9)
+        self._arc_ball.Transform[:3, :3] /= self._scale
+        self._arc_ball.Transform[3, :3] = -self._center / self._scale
 
-            self._camera_zoom = 1.0
+        self._camera_zoom = 1.0
 
     def setAspectRatio(self, aspect_ratio: float):
         self._aspect_ratio = aspect_ratio
@@ -82,6 +104,59 @@ class Camera(object):
     def cameraZoom(self) -> float:
         return self._camera_zoom
 
+    def matrix(self) -> np.ndarray:
+        return self._matrix
+
+    def version(self) -> int:
+        return self._version
+
+    def setTile(self, image_size: tuple[int, int] = None, rect: tuple[int, int, int, int] = None):
+        """
+        Restricts the projection to the (x, y, width, height) pixel rectangle, top left origin, of an
+        image of image_size, so a large image can be rendered one tile at a time. None restores the full view
+        """
+        if image_size is None:
+            self._tile = None
+            return
+
+        image_width, image_height = image_size
+        x, y, width, height = rect
+
+        # Scale the tile's part of clip space up to the whole of it
+        tile = np.identity(4)
+        tile[0, 0] = image_width / width
+        tile[1, 1] = image_height / height
+        tile[3, 0] = -(-1.0 + (2 * x + width) / image_width) * tile[0, 0]
+        tile[3, 1] = -(1.0 - (2 * y + height) / image_height) * tile[1, 1]
+
+        self._tile = (tile, image_width / image_height, height)
+
+    def worldUnitsPerPixel(self) -> float:
+        """
+        Returns the size of a screen pixel in world units for the current view and zoom
+        """
+        height = self._tile[2] if self._tile is not None else self.scene.height()
+        pixels_per_unit = np.linalg.norm(self._matrix[:3, 1].astype('f8')) * height / 2.0
+
+        return 1.0 / max(pixels_per_unit, 1e-12)
+
+    def boxesInView(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        Returns a mask of the (n, 2, 3) axis aligned min/max boxes that intersect the view frustum
+        """
+        # All 8 corners of every box in clip space (row vectors, as the matrix is written to the shaders)
+        corner_indices = np.array([[i >> 2 & 1, i >> 1 & 1, i & 1] for i in range(8)])
+        corners = boxes[:, corner_indices, np.arange(3)]
+        clip = np.concatenate([corners, np.ones(corners.shape[:2] + (1,))], axis=2) @ self._matrix.astype('f8')
+
+        # A box is outside if all of its corners are beyond the same clip plane
+        w = clip[:, :, 3]
+        outside = np.zeros(len(boxes), dtype=bool)
+        for axis in range(3):
+            outside |= (clip[:, :, axis] < -w).all(axis=1) | (clip[:, :, axis] > w).all(axis=1)
+
+        return ~outside
+
     def onOrbitStart(self, x, y):
         self._arc_ball.onClickLeftDown(x, y)
 
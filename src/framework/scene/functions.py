@@ -25,4 +25,13 @@ def isConvertibleToFloat(value):
 
 vertex_shad = open('shaders/main_vertex_shader.glsl', 'r').read()
 fragment_shad = open('shaders/main_fragment_shader.glsl', 'r').read()
-
+shaded_vertex_shad = open('shaders/shaded_vertex_shader.glsl', 'r').read()
+shaded_fragment_shad = open('shaders/shaded_fragment_shader.glsl', 'r').read()
+point_vertex_shad = open('shaders/point_vertex_shader.glsl', 'r').read()
+point_fragment_shad = open('shaders/point_fragment_shader.glsl', 'r').read()
+text_vertex_shad = open('shaders/text_vertex_shader.glsl', 'r').read()
+text_fragment_shad = open('shaders/text_fragment_shader.glsl', 'r').read()
+picking_vertex_shad = open('shaders/picking_vertex_shader.glsl', 'r').read()
+picking_fragment_shad = open('shaders/picking_fragment_shader.glsl', 'r').read()
+picking_point_vertex_shad = open('shaders/picking_point_vertex_shader.glsl', 'r').read()
+picking_point_fragment_shad = open('shaders/picking_point_fragment_shader.glsl', 'r').read()
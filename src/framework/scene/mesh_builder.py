@@ -0,0 +1,89 @@
+from src._imports import *
+from src.framework.scene.metrics import metrics
+import concurrent.futures
+import traceback
+
+
+class MeshBuilder(QObject):
+    """
+    Builds item geometry (vertex arrays) on a pool of worker threads and hands the results back
+    to the GL thread, where they are uploaded at the start of the next frame. Jobs are keyed by
+    item and name, submitting a job again replaces the pending one so stale meshes are never uploaded
+    """
+    MaximumWorkers = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+    finished = pyqtSignal()
+
+    def __init__(self, scene):
+        super().__init__()
+        self._scene = scene
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=MeshBuilder.MaximumWorkers,
+                                                               thread_name_prefix='dot39-mesh')
+        self._jobs = {}  # (item id, name) -> (item, future, upload, submit time)
+
+        # Emitted from the worker threads, so the repaint request is queued onto the GUI thread
+        self.finished.connect(self._scene.update)
+
+    def submit(self, item, name: str, build, upload):
+        """
+        Runs build() on a worker thread, then upload(result) on the GL thread once it has finished
+        """
+        self.cancel(item, name)
+
+        future = self._executor.submit(build)
+        future.add_done_callback(lambda _: self.finished.emit())
+        self._jobs[(id(item), name)] = (item, future, upload, metrics.now() if metrics.enabled else 0.0)
+
+    def cancel(self, item, name: str = None):
+        """
+        Drops the pending job of the item with the name (every job of the item by default)
+        """
+        for key in [key for key in self._jobs if key[0] == id(item) and (name is None or key[1] == name)]:
+            self._jobs.pop(key)[1].cancel()
+
+    def isPending(self, item, name: str) -> bool:
+        return (id(item), name) in self._jobs
+
+    def uploadFinished(self) -> int:
+        """
+        Uploads the results of the finished jobs, must be called with the GL context current
+        """
+        finished = [key for key, (_, future, _, _) in self._jobs.items() if future.done()]
+
+        for key in finished:
+            item, future, upload, start = self._jobs.pop(key)
+
+            try:
+                result = future.result()
+
+            except Exception as error:
+                # The job is dropped so the item keeps drawing its last good mesh
+                sys.stderr.write(f'{type(item).__name__} {key[1]} build failed:\n')
+                traceback.print_exception(type(error), error, error.__traceback__)
+
+                if metrics.enabled:
+                    metrics.record('mesh build failed', type=type(item).__name__, job=key[1],
+                                   error=f'{type(error).__name__}: {error}')
+
+                continue
+
+            upload(result)
+
+            if metrics.enabled:
+                metrics.record('mesh upload', type=type(item).__name__, job=key[1], ms=metrics.elapsedMs(start))
+
+        return len(finished)
+
+    def wait(self):
+        """
+        Blocks until every pending job has finished and uploads the results
+        """
+        while self._jobs:
+            concurrent.futures.wait([future for _, future, _, _ in self._jobs.values()])
+            self.uploadFinished()
+
+    def shutdown(self):
+        for key in list(self._jobs):
+            self._jobs.pop(key)[1].cancel()
+
+        self._executor.shutdown(wait=False)
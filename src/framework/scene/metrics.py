@@ -0,0 +1,84 @@
+from src._imports import *
+import atexit
+import collections
+import time
+
+
+class Metrics(object):
+    """
+    Ring buffer of structured events (frame timings, draw counts, picking latency).
+    Callers guard every record with `if metrics.enabled:` so nothing is timed, formatted
+    or allocated while profiling is off. Enable it with the DOT39_PROFILE environment variable
+    """
+    Capacity = 4096
+
+    def __init__(self, enabled: bool = False, capacity: int = Capacity):
+        self.enabled = enabled
+        self._events = collections.deque(maxlen=capacity)
+
+    @staticmethod
+    def now() -> float:
+        return time.perf_counter()
+
+    @staticmethod
+    def elapsedMs(start: float) -> float:
+        return (time.perf_counter() - start) * 1000.0
+
+    def setEnabled(self, enabled: bool):
+        self.enabled = enabled
+
+    def record(self, name: str, **fields):
+        """
+        Appends an event, dropping the oldest one once the buffer is full
+        """
+        self._events.append((time.perf_counter(), name, fields))
+
+    def events(self, name: str = None) -> list[tuple[float, str, dict]]:
+        """
+        Returns the buffered (timestamp, name, fields) events, optionally only those with the name
+        """
+        return [event for event in self._events if name is None or event[1] == name]
+
+    def clear(self):
+        self._events.clear()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the count, mean and max of every numeric field per event name
+        """
+        values = collections.defaultdict(lambda: collections.defaultdict(list))
+
+        for _, name, fields in self._events:
+            values[name]['count'].append(1)
+
+            for key, value in fields.items():
+                if isinstance(value, (int, float)):
+                    values[name][key].append(value)
+
+        summary = {}
+        for name, fields in values.items():
+            summary[name] = {'count': len(fields.pop('count'))}
+
+            for key, field_values in fields.items():
+                summary[name][f'{key} mean'] = sum(field_values) / len(field_values)
+                summary[name][f'{key} max'] = max(field_values)
+
+        return summary
+
+    def dump(self, stream=None):
+        """
+        Writes the buffered events, one per line, followed by the summary
+        """
+        stream = stream or sys.stderr
+
+        for timestamp, name, fields in self._events:
+            stream.write(f'{timestamp:.6f} {name} ' + ' '.join(f'{k}={v}' for k, v in fields.items()) + '\n')
+
+        for name, fields in self.summary().items():
+            stream.write(f'{name}: ' + ', '.join(f'{k}={v:.3f}' for k, v in fields.items()) + '\n')
+
+
+metrics = Metrics(enabled=os.environ.get('DOT39_PROFILE', '0') not in ('', '0'))
+
+if metrics.enabled:
+    atexit.register(metrics.dump)
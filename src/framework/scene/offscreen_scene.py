@@ -0,0 +1,120 @@
+from src._imports import *
+from src.framework.scene.scene_core import SceneCore
+from src.framework.scene.tiled_export import TiledExporter
+
+# Text outlines need a QGuiApplication for font access, kept alive here when a script has none
+_application = None
+
+
+class OffscreenScene(SceneCore):
+    """
+    Renders scene items into an offscreen framebuffer of a standalone OpenGL context, for batch
+    image output without a window (e.g. on a headless server with EGL or osmesa)
+    """
+
+    def __init__(self, width: int = 1920, height: int = 1080, samples: int = 4, backend: str = None):
+        global _application
+
+        if QGuiApplication.instance() is None:
+            _application = QGuiApplication(['dot39', '-platform', 'offscreen'])
+
+        self.initScene()
+        self._width = width
+        self._height = height
+        self._samples = samples
+
+        self.initializeContext(GL.create_standalone_context(require=330, **({'backend': backend} if backend else {})))
+
+        self._fbo = None
+        self._resolve_fbo = None
+        self._resources = []
+        self.resize(width, height)
+
+    def width(self) -> int:
+        return self._width
+
+    def height(self) -> int:
+        return self._height
+
+    def update(self):
+        # There is no window to repaint, frames are only drawn by render()
+        pass
+
+    def makeCurrent(self):
+        # The standalone context is the only one, so it is always current
+        pass
+
+    def resize(self, width: int, height: int):
+        """
+        Recreates the offscreen framebuffers at the new image size
+        """
+        for resource in self._resources:
+            resource.release()
+
+        self._width, self._height = max(2, width), max(2, height)
+        size = (self._width, self._height)
+
+        # Draw multisampled, then resolve into a single sample framebuffer that can be read
+        color = self.ctx.renderbuffer(size, 4, samples=self._samples)
+        depth = self.ctx.depth_renderbuffer(size, samples=self._samples)
+        self._fbo = self.ctx.framebuffer(color_attachments=[color], depth_attachment=depth)
+
+        resolved = self.ctx.renderbuffer(size, 4)
+        self._resolve_fbo = self.ctx.framebuffer(color_attachments=[resolved])
+
+        self._resources = [self._fbo, self._resolve_fbo, color, depth, resolved]
+        self.camera.resize(self._width, self._height)
+
+    def fitToBounds(self, bounds: np.ndarray = None):
+        """
+        Frames the bounds (the scene bounds by default) in a plan view
+        """
+        bounds = self.sceneBounds() if bounds is None else bounds
+
+        if bounds is not None:
+            self.camera.fitBounds(bounds)
+
+    def render(self) -> np.ndarray:
+        """
+        Draws the scene and returns the image as a (height, width, 3) uint8 array, top row first
+        """
+        # Images are only written once, so wait for the meshes still being built
+        self._mesh_builder.wait()
+
+        self._fbo.use()
+        self.ctx.viewport = (0, 0, self._width, self._height)
+        self.renderScene()
+
+        self.ctx.copy_framebuffer(self._resolve_fbo, self._fbo)
+        data = self._resolve_fbo.read(components=3, alignment=1)
+
+        return np.frombuffer(data, dtype=np.uint8).reshape(self._height, self._width, 3)[::-1]
+
+    def renderToFile(self, path: str) -> bool:
+        """
+        Draws the scene and saves it as an image, the format is taken from the file extension
+        """
+        pixels = self.render().tobytes()
+        image = QImage(pixels, self._width, self._height, self._width * 3, QImage.Format.Format_RGB888)
+
+        return image.save(path)
+
+    def renderTiled(self, path: str, width: int, height: int, dpi: float = None,
+                    tile_size: int = TiledExporter.DefaultTileSize) -> bool:
+        """
+        Draws the scene at a size beyond the framebuffer limits and streams it into a PNG file
+        """
+        return TiledExporter(self, tile_size, self._samples).export(path, width, height, dpi)
+
+    def release(self):
+        """
+        Releases the framebuffers and the standalone context
+        """
+        for resource in self._resources:
+            resource.release()
+
+        self._resources = []
+        self._mesh_builder.shutdown()
+        self._render_queue.clear()
+        self._vao_cache.clear()
+        self.ctx.release()
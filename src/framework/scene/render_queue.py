@@ -0,0 +1,211 @@
+from src._imports import *
+from src.framework.scene.metrics import metrics
+
+
+class DrawPacket(object):
+    """
+    A single draw call with the GL state it needs, gathered by the RenderQueue
+    """
+    __slots__ = ('program', 'content', 'mode', 'uniforms', 'line_width', 'instances', 'textures', 'filled',
+                 'mergeable', 'index_buffer', 'first', 'vertices')
+
+    def __init__(self, program: GL.Program, content: list[tuple], mode: int, uniforms: tuple, line_width: float,
+                 instances: int, textures: tuple, filled: bool, mergeable: bool, index_buffer: GL.Buffer,
+                 first: int = 0, vertices: int = -1):
+        self.program = program
+        self.content = content
+        self.mode = mode
+        self.uniforms = uniforms
+        self.line_width = line_width
+        self.instances = instances
+        self.textures = textures
+        self.filled = filled
+        self.mergeable = mergeable
+        self.index_buffer = index_buffer
+        self.first = first
+        self.vertices = vertices
+
+    def stateKey(self) -> tuple:
+        return self.program.glo, self.filled, self.mode, self.line_width, self.uniforms
+
+
+class RenderQueue(object):
+    """
+    Collects the draw packets of a frame, merges static line geometry that shares the same
+    state into one buffer and issues the draws sorted by program, primitive, line width and
+    uniforms so GL state and uniforms are only written when they change
+    """
+    DefaultLineWidth = 3.0
+    Separator = np.full(3, np.nan, dtype='f4').tobytes()  # Breaks a line strip between merged parts
+    VertexSize = 12  # Bytes of one '3f' vertex
+
+    def __init__(self, scene):
+        self._scene = scene
+        self._packets = []
+        self._merged = {}  # Part buffer ids -> merged buffer
+        self._merged_by_part = {}  # Part buffer id -> merged keys that copy it
+        self._merged_used = set()
+
+    @staticmethod
+    def uniformValue(value):
+        # Colors arrive as tuples, lists or arrays, normalize them so they compare and sort
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return tuple(float(v) for v in value)
+
+        return value
+
+    def submit(self, program: GL.Program, content: list[tuple], mode: int, uniforms: dict = None,
+               line_width: float = None, instances: int = 1, textures: tuple = (), filled: bool = False,
+               mergeable: bool = False, index_buffer: GL.Buffer = None, first: int = 0, vertices: int = -1):
+        """
+        Queues a draw of the vertices starting at first (all of them by default). Mergeable packets
+        must be a single '3f' in_vert buffer of lines, or of line strips/loops whose subpaths end
+        with a NaN row, whose contents only change through replacement, releaseBuffer or bufferWritten
+        """
+        uniforms = tuple(sorted((name, self.uniformValue(value)) for name, value in (uniforms or {}).items()))
+
+        self._packets.append(DrawPacket(program, content, mode, uniforms,
+                                        line_width or RenderQueue.DefaultLineWidth, instances, tuple(textures),
+                                        filled, mergeable and first == 0 and vertices < 0, index_buffer, first,
+                                        vertices))
+
+    def flush(self):
+        """
+        Draws and clears the queued packets
+        """
+        packets = self.mergePackets(self._packets)
+        packets.sort(key=DrawPacket.stateKey)
+        self._packets = []
+
+        ctx = self._scene.ctx
+        wireframe = self._scene.isWireframe()
+        uniform_state = {}
+        uniform_writes = 0
+
+        for packet in packets:
+            for name, value in packet.uniforms:
+                if uniform_state.get((packet.program.glo, name)) != value:
+                    packet.program[name].value = value
+                    uniform_state[(packet.program.glo, name)] = value
+                    uniform_writes += 1
+
+            if ctx.line_width != packet.line_width:
+                ctx.line_width = packet.line_width
+
+            if ctx.wireframe != (wireframe and not packet.filled):
+                ctx.wireframe = wireframe and not packet.filled
+
+            for texture, location in packet.textures:
+                texture.use(location)
+
+            vao = self._scene.vertexArray(packet.program, packet.content, packet.index_buffer)
+            vao.render(packet.mode, vertices=packet.vertices, first=packet.first, instances=packet.instances)
+
+        ctx.line_width = RenderQueue.DefaultLineWidth
+        ctx.wireframe = wireframe
+
+        self.releaseUnusedMerges()
+
+        if metrics.enabled:
+            metrics.record('render queue', draws=len(packets), uniform_writes=uniform_writes)
+
+    def mergePackets(self, packets: list[DrawPacket]) -> list[DrawPacket]:
+        """
+        Replaces groups of mergeable packets sharing the same state with one packet drawing a merged buffer
+        """
+        groups = {}
+        result = []
+
+        for packet in packets:
+            if packet.mergeable:
+                strip = packet.mode != GL.LINES
+                key = (strip, packet.program.glo, packet.filled, packet.line_width, packet.uniforms)
+                groups.setdefault(key, []).append(packet)
+
+            else:
+                result.append(packet)
+
+        for (strip, *_), group in groups.items():
+            if len(group) == 1:
+                result.append(group[0])
+                continue
+
+            first = group[0]
+            buffer = self.mergedBuffer([packet.content[0][0] for packet in group], strip)
+            result.append(DrawPacket(first.program, [(buffer, '3f', 'in_vert')],
+                                     GL.LINE_STRIP if strip else GL.LINES, first.uniforms, first.line_width, 1, (),
+                                     first.filled, False, None))
+
+        return result
+
+    def mergedBuffer(self, parts: list[GL.Buffer], strip: bool) -> GL.Buffer:
+        """
+        Returns a buffer holding copies of the parts, reusing the one from an earlier frame if the parts are the same
+        """
+        key = (strip,) + tuple(part.glo for part in parts)
+        self._merged_used.add(key)
+
+        if key in self._merged:
+            return self._merged[key]
+
+        separator = len(RenderQueue.Separator) if strip else 0
+
+        # Only whole vertices are copied, a trailing partial vertex would shift every later part out of step
+        sizes = [part.size // RenderQueue.VertexSize * RenderQueue.VertexSize for part in parts]
+        merged = self._scene.ctx.buffer(reserve=max(1, sum(sizes) + separator * (len(parts) - 1)))
+
+        # Copy the parts on the GPU, strips are separated by a NaN vertex so they don't join up
+        offset = 0
+        for i, (part, size) in enumerate(zip(parts, sizes)):
+            if i and separator:
+                merged.write(RenderQueue.Separator, offset=offset)
+                offset += separator
+
+            if size:
+                self._scene.ctx.copy_buffer(merged, part, size=size, write_offset=offset)
+                offset += size
+
+        self._merged[key] = merged
+        for part in parts:
+            self._merged_by_part.setdefault(part.glo, set()).add(key)
+
+        return merged
+
+    def releaseMerged(self, key: tuple):
+        merged = self._merged.pop(key, None)
+
+        if merged is None:
+            return
+
+        for glo in key[1:]:
+            keys = self._merged_by_part.get(glo)
+
+            if keys is not None:
+                keys.discard(key)
+
+                if not keys:
+                    del self._merged_by_part[glo]
+
+        self._scene.releaseBuffer(merged)
+
+    def releaseUnusedMerges(self):
+        for key in [key for key in self._merged if key not in self._merged_used]:
+            self.releaseMerged(key)
+
+        self._merged_used = set()
+
+    def bufferWritten(self, buffer: GL.Buffer):
+        """
+        Drops the merged buffers holding a copy of a buffer whose contents were rewritten
+        """
+        for key in list(self._merged_by_part.get(buffer.glo, ())):
+            self.releaseMerged(key)
+
+    def releaseBuffer(self, buffer: GL.Buffer):
+        self.bufferWritten(buffer)
+
+    def clear(self):
+        self._packets = []
+
+        for key in list(self._merged):
+            self.releaseMerged(key)
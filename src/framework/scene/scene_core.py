@@ -0,0 +1,464 @@
+from src._imports import *
+from src.errors.standard_error import DOT39StandardError
+from src.framework.items.base_item import BaseItem
+from src.framework.items.terrain_item import TerrainItem
+from src.framework.scene.functions import (hexToRGB, vertex_shad, fragment_shad, shaded_vertex_shad,
+                                           shaded_fragment_shad, point_vertex_shad, point_fragment_shad,
+                                           text_vertex_shad, text_fragment_shad, picking_vertex_shad,
+                                           picking_fragment_shad, picking_point_vertex_shad,
+                                           picking_point_fragment_shad)
+from src.framework.scene.camera import Camera
+from src.framework.scene.vertex_array_cache import VertexArrayCache
+from src.framework.scene.sdf_text import SdfTextRenderer
+from src.framework.scene.metrics import metrics
+from src.framework.scene.render_queue import RenderQueue
+from src.framework.scene.mesh_builder import MeshBuilder
+
+
+class SceneCore(object):
+    """
+    Item management and rendering shared by the interactive BaseScene widget and the
+    windowless OffscreenScene. Subclasses provide width(), height() and update()
+    """
+
+    def initScene(self):
+        """
+        Sets up the item indexes and render settings, call before any item is created
+        """
+        self.ctx = None
+        self.camera = None
+        self.program = None
+        self.shaded_program = None
+        self.point_program = None
+        self.text_program = None
+        self.picking_program = None
+        self.point_picking_program = None
+        self.bg_color = hexToRGB('#000000')
+
+        self._items = []
+        self._visible = set()
+        self._visible_items = None  # Render ordered cache, rebuilt after a visibility change
+        self._selection = {}  # Selected and visible items, in selection order
+        self._items_by_type = {}
+        self._scene_bounds = None
+        self._scene_bounds_valid = True
+        self._scene_version = 0
+        self._wireframe = True
+        self._sdf_text = False
+        self._contours_visible = True
+        self._contour_intervals = (TerrainItem.ContourMinorInterval, TerrainItem.ContourMajorInterval)
+        self._text_renderer = None
+        self._vao_cache = None
+        self._render_queue = None
+        self._mesh_builder = None
+
+        # Vertex arrays handed out during the current frame, only counted while profiling
+        self._draw_count = 0
+
+    def initializeContext(self, ctx: GL.Context):
+        """
+        Compiles the shader programs and creates the camera and draw caches for the context
+        """
+        self.ctx = ctx
+        self.ctx.clear(*self.bg_color)
+        self.ctx.enable(GL.DEPTH_TEST)
+        self.ctx.wireframe = self.isWireframe()
+        self.ctx.line_width = RenderQueue.DefaultLineWidth
+
+        self.program = self.ctx.program(
+            vertex_shader=vertex_shad,
+            fragment_shader=fragment_shad
+        )
+        self.shaded_program = self.ctx.program(
+            vertex_shader=shaded_vertex_shad,
+            fragment_shader=shaded_fragment_shad
+        )
+        self.point_program = self.ctx.program(
+            vertex_shader=point_vertex_shad,
+            fragment_shader=point_fragment_shad
+        )
+        self.text_program = self.ctx.program(
+            vertex_shader=text_vertex_shad,
+            fragment_shader=text_fragment_shad
+        )
+        self.picking_program = self.ctx.program(
+            vertex_shader=picking_vertex_shad,
+            fragment_shader=picking_fragment_shad
+        )
+        self.point_picking_program = self.ctx.program(
+            vertex_shader=picking_point_vertex_shad,
+            fragment_shader=picking_point_fragment_shad
+        )
+
+        self.camera = Camera(self)
+        self._vao_cache = VertexArrayCache(self.ctx)
+        self._render_queue = RenderQueue(self)
+        self._mesh_builder = MeshBuilder(self)
+
+    def renderScene(self) -> list[BaseItem]:
+        """
+        Draws the items in view into the currently bound framebuffer, returns the items drawn
+        """
+        self.ctx.wireframe = self.isWireframe()
+        self.ctx.clear(*self.bg_color)
+        self.ctx.enable_only(GL.DEPTH_TEST | GL.BLEND)
+
+        self.camera.update()
+
+        # Meshes built in the background since the last frame are uploaded before anything is drawn
+        self._mesh_builder.uploadFinished()
+
+        # Items queue their draws, which are then merged and issued sorted by GL state
+        items = self.itemsInView()
+        for item in items:
+            item.render()
+
+        self._render_queue.flush()
+
+        return items
+
+    def sceneBounds(self) -> np.ndarray or None:
+        """
+        Returns the (2, 3) min and max corners around the geometry of the visible items,
+        merged from their cached bounding boxes. None if nothing has bounds
+        """
+        if not self._scene_bounds_valid:
+            boxes = [box for box in (item.boundingBox() for item in self.visibleItems()) if box is not None]
+            self._scene_bounds = np.array([np.min([box[0] for box in boxes], axis=0),
+                                           np.max([box[1] for box in boxes], axis=0)]) if boxes else None
+            self._scene_bounds_valid = True
+
+        return self._scene_bounds
+
+    def _growSceneBounds(self, box: np.ndarray or None):
+        """
+        Merges a newly visible item's box into the scene bounds in place rather than recomputing them
+        """
+        if box is None or not self._scene_bounds_valid:
+            return
+
+        if self._scene_bounds is None:
+            self._scene_bounds = box.copy()
+
+        else:
+            self._scene_bounds = np.array([np.minimum(self._scene_bounds[0], box[0]),
+                                           np.maximum(self._scene_bounds[1], box[1])])
+
+    def itemBoundsChanged(self, item: BaseItem):
+        """
+        Called by items when their bounding box is invalidated
+        """
+        self._scene_bounds_valid = False
+
+    def addItem(self, item: BaseItem):
+        """
+        Adds the item to the render que
+        """
+
+        if item not in self._items_by_type.get(type(item), {}):
+            self._items.append(item)
+            self._items_by_type.setdefault(type(item), {})[item] = None
+            self.itemStateChanged(item)
+
+        if metrics.enabled:
+            metrics.record('item added', type=type(item).__name__, items=len(self._items))
+
+        self.markSceneDirty()
+        self.update()
+
+    def removeItem(self, item: BaseItem, release: bool = False):
+        """
+        Removes items from the render que, release frees its buffers when it will never be added back
+        """
+        self._items.remove(item)
+        self._items_by_type[type(item)].pop(item)
+        self._selection.pop(item, None)
+        self._visible.discard(item)
+        self._visible_items = None
+        self._scene_bounds_valid = False
+
+        # Undo and redo add the same item back, so by default it keeps its buffers and its pending background
+        # builds, which still land while it is off the scene. Only the vertex arrays go
+        if release:
+            self._mesh_builder.cancel(item)
+
+            for buffer in item.buffers():
+                self.releaseBuffer(buffer)
+
+        else:
+            for buffer in item.buffers():
+                self.releaseVertexArrays(buffer)
+
+        if metrics.enabled:
+            metrics.record('item removed', type=type(item).__name__, items=len(self._items))
+
+        self.markSceneDirty()
+        self.update()
+
+    def items(self) -> list[BaseItem]:
+        """
+        Returns a list of items currently in the render que
+        """
+        return self._items
+
+    def itemsOfType(self, item_type: type) -> list[BaseItem]:
+        """
+        Returns the items on the scene that are instances of the type
+        """
+        return [item for t, items in self._items_by_type.items() if issubclass(t, item_type) for item in items]
+
+    def visibleItems(self) -> list[BaseItem]:
+        """
+        Returns a list of all the visible items on the scene (shared, don't modify it)
+        """
+        if self._visible_items is None:
+            self._visible_items = [item for item in self._items if item.isVisible()]
+
+        return self._visible_items
+
+    def itemsInView(self) -> list[BaseItem]:
+        """
+        Returns the visible items whose bounding box intersects the camera's view frustum
+        """
+        items = self.visibleItems()
+        boxes = [item.viewBoundingBox() for item in items]
+        bounded = [i for i, box in enumerate(boxes) if box is not None]
+
+        if not bounded:
+            return items
+
+        in_view = np.ones(len(items), dtype=bool)
+        in_view[bounded] = self.camera.boxesInView(np.array([boxes[i] for i in bounded], dtype='f8'))
+
+        return [item for item, visible in zip(items, in_view) if visible]
+
+    def selectedItems(self):
+        """
+        Returns a list of all the selected items on the scene
+        """
+        return list(self._selection)
+
+    def activeSelection(self) -> BaseItem or None:
+        """
+        Returns the selected item (if there is only one item selected
+        on the scene)
+        """
+        if len(self._selection) == 1:
+            return next(iter(self._selection))
+
+        return None
+
+    def itemStateChanged(self, item: BaseItem):
+        """
+        Keeps the visible and selected item indexes in sync, called by items when
+        their visibility or selection changes
+        """
+        if item not in self._items_by_type.get(type(item), {}):
+            return
+
+        if item.isVisible() != (item in self._visible):
+            if item.isVisible():
+                self._visible.add(item)
+                self._growSceneBounds(item.boundingBox())
+
+            else:
+                self._visible.discard(item)
+                self._scene_bounds_valid = False
+
+            self._visible_items = None
+
+        if item.isVisible() and item.isSelected():
+            self._selection[item] = None
+
+        else:
+            self._selection.pop(item, None)
+
+    def markSceneDirty(self):
+        """
+        Flags that item geometry or visibility changed, so the picking buffer is re-rendered
+        """
+        self._scene_version += 1
+
+    def setBackgroundColor(self, color: str):
+        """
+        Sets the background color of the scene to the specified hex value
+        """
+        self.bg_color = hexToRGB(color)
+
+        self.update()
+
+    def isWireframe(self):
+        """
+        Returns if the scene is wireframe enabled
+        """
+        return self._wireframe
+
+    def setWireframe(self, enabled: bool):
+        """
+        Sets the scene to wireframe mode
+        """
+        self._wireframe = enabled
+
+        self.markSceneDirty()
+        self.update()
+
+    def isSdfTextEnabled(self):
+        """
+        Returns if labels are drawn with the signed distance field text renderer
+        """
+        return self._sdf_text
+
+    def setSdfTextEnabled(self, enabled: bool):
+        """
+        Switches labels between outline polylines and signed distance field quads
+        """
+        self._sdf_text = enabled
+
+        self.update()
+
+    def contoursVisible(self) -> bool:
+        """
+        Returns if surfaces draw their contours
+        """
+        return self._contours_visible
+
+    def setContoursVisible(self, visible: bool):
+        """
+        Shows or hides the contours of every surface, new surfaces follow the setting
+        """
+        self._contours_visible = visible
+
+        for item in self.itemsOfType(TerrainItem):
+            item.setContoursVisible(visible)
+
+        self.update()
+
+    def contourIntervals(self) -> tuple[float, float]:
+        """
+        Returns the (minor, major) contour intervals of the surfaces
+        """
+        return self._contour_intervals
+
+    def setContourIntervals(self, minor: float, major: float):
+        """
+        Sets the minor and major contour intervals of every surface, new surfaces follow the setting
+        """
+        if minor <= 0 or major <= 0:
+            raise DOT39StandardError('Contour intervals must be greater than zero')
+
+        self._contour_intervals = (minor, major)
+
+        for item in self.itemsOfType(TerrainItem):
+            item.setContourIntervals(minor, major)
+
+        self.update()
+
+    def context(self) -> GL.Context:
+        """
+        Returns the OpenGL context for the scene
+        """
+        return self.ctx
+
+    def shaderProgram(self) -> GL.Program:
+        """
+        Returns the OpenGL shader program for the scene
+        """
+        return self.program
+
+    def shadedShaderProgram(self) -> GL.Program:
+        """
+        Returns the lit OpenGL shader program used to draw surfaces in solid mode
+        """
+        return self.shaded_program
+
+    def pointShaderProgram(self) -> GL.Program:
+        """
+        Returns the instanced OpenGL shader program used to draw point groups
+        """
+        return self.point_program
+
+    def textShaderProgram(self) -> GL.Program:
+        """
+        Returns the OpenGL shader program used to draw signed distance field text
+        """
+        return self.text_program
+
+    def pickingProgram(self) -> GL.Program:
+        """
+        Returns the OpenGL shader program that writes item and primitive IDs
+        """
+        return self.picking_program
+
+    def pointPickingProgram(self) -> GL.Program:
+        """
+        Returns the instanced OpenGL shader program that writes item and point IDs
+        """
+        return self.point_picking_program
+
+    def shaderPrograms(self) -> list[GL.Program]:
+        """
+        Returns every OpenGL shader program that uses the camera matrix
+        """
+        return [self.program, self.shaded_program, self.point_program, self.text_program, self.picking_program,
+                self.point_picking_program]
+
+    def textRenderer(self) -> SdfTextRenderer:
+        """
+        Returns the signed distance field text renderer, creating its glyph atlas on first use
+        """
+        if self._text_renderer is None:
+            self._text_renderer = SdfTextRenderer(self)
+
+        return self._text_renderer
+
+    def vertexArray(self, program: GL.Program, content: list[tuple],
+                    index_buffer: GL.Buffer = None) -> GL.VertexArray:
+        """
+        Returns a persistent vertex array for the program and buffer layout, so items
+        don't build a new vertex array object on every frame
+        """
+        if metrics.enabled:
+            self._draw_count += 1
+
+        return self._vao_cache.vertexArray(program, content, index_buffer)
+
+    def releaseBuffer(self, buffer: GL.Buffer or None):
+        """
+        Releases a buffer that is being replaced, invalidating any cached vertex arrays using it
+        """
+        if buffer:
+            self._render_queue.releaseBuffer(buffer)
+            self._vao_cache.releaseBuffer(buffer)
+
+    def releaseVertexArrays(self, buffer: GL.Buffer or None):
+        """
+        Drops the cached vertex arrays and merged copies of a buffer that is no longer drawn, keeping the buffer
+        """
+        if buffer:
+            self._render_queue.releaseBuffer(buffer)
+            self._vao_cache.releaseVertexArrays(buffer)
+
+    def bufferWritten(self, buffer: GL.Buffer or None):
+        """
+        Notifies the scene that a buffer's contents were rewritten in place, so merged copies are rebuilt
+        """
+        if buffer:
+            self._render_queue.bufferWritten(buffer)
+
+    def renderQueue(self) -> RenderQueue:
+        """
+        Returns the queue items submit their draws to while the scene is painted
+        """
+        return self._render_queue
+
+    def meshBuilder(self) -> MeshBuilder:
+        """
+        Returns the worker pool items build their geometry on
+        """
+        return self._mesh_builder
+
+    def sceneCamera(self) -> Camera:
+        """
+        Returns the camera class for the scene
+        """
+        return self.camera
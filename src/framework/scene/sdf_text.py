@@ -0,0 +1,173 @@
+from src._imports import *
+from src.framework.scene.text_mesh import TextMesh
+from scipy.ndimage import distance_transform_edt
+
+
+class SdfFontAtlas(object):
+    FirstChar = 32
+    LastChar = 126
+
+    def __init__(self, ctx: GL.Context, text_mesh: TextMesh, pixel_size: int = 48, spread: int = 6,
+                 width: int = 1024):
+        self._text_mesh = text_mesh
+        self._glyphs = {}
+        self.texture = self.createTexture(ctx, pixel_size, spread, width)
+
+    def createTexture(self, ctx: GL.Context, pixel_size: int, spread: int, width: int) -> GL.Texture:
+        """
+        Renders every printable ASCII glyph into a signed distance field atlas texture
+        """
+        font = self._text_mesh.font()
+        scale = pixel_size / QFontMetricsF(font).height()
+        padding = spread + 1
+
+        # Pack the glyph cells onto shelves
+        cells = []
+        x = y = shelf_height = 0
+        for code in range(SdfFontAtlas.FirstChar, SdfFontAtlas.LastChar + 1):
+            path = QPainterPath()
+            path.addText(QPointF(0, 0), font, chr(code))
+
+            if path.isEmpty():
+                continue
+
+            rect = path.boundingRect()
+            w = int(math.ceil(rect.width() * scale)) + 2 * padding
+            h = int(math.ceil(rect.height() * scale)) + 2 * padding
+
+            if x + w > width:
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+
+            cells.append((chr(code), path, rect, x, y, w, h))
+            x += w
+            shelf_height = max(shelf_height, h)
+
+        height = max(1, y + shelf_height)
+
+        # Rasterize the glyph coverage
+        image = QImage(width, height, QImage.Format.Format_Grayscale8)
+        image.fill(0)
+
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        for char, path, rect, x, y, w, h in cells:
+            painter.save()
+            painter.translate(x + padding - rect.left() * scale, y + padding - rect.top() * scale)
+            painter.scale(scale, scale)
+            painter.fillPath(path, QColor('#ffffff'))
+            painter.restore()
+        painter.end()
+
+        # QImage rows are padded to 32-bit boundaries
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * height)
+        coverage = np.frombuffer(bits, dtype=np.uint8).reshape(height, image.bytesPerLine())[:, :width]
+
+        # Signed distance to the glyph edge, mapped so the edge sits at 0.5
+        inside = coverage > 127
+        distance = distance_transform_edt(~inside) - distance_transform_edt(inside)
+        sdf = np.clip(0.5 - distance / (2 * spread), 0.0, 1.0)
+
+        for char, path, rect, x, y, w, h in cells:
+            self._glyphs[char] = (rect.left() - padding / scale, rect.top() - padding / scale,
+                                  w / scale, h / scale,
+                                  x / width, y / height, (x + w) / width, (y + h) / height)
+
+        texture = ctx.texture((width, height), 1, (sdf * 255).astype('u1').tobytes())
+        texture.filter = (GL.LINEAR, GL.LINEAR)
+
+        return texture
+
+    def layout(self, lines: list[str], line_spacing: float) -> np.ndarray:
+        """
+        Returns one row per visible character: quad x, y, width, height (font units, y down)
+        followed by the atlas rectangle u0, v0, u1, v1
+        """
+        rows = []
+
+        for i, line in enumerate(lines):
+            pen_x = 0.0
+
+            for char in line:
+                glyph = self._glyphs.get(char)
+
+                if glyph:
+                    x, y, w, h, u0, v0, u1, v1 = glyph
+                    rows.append((pen_x + x, i * line_spacing + y, w, h, u0, v0, u1, v1))
+
+                pen_x += self._text_mesh.advance(char)
+
+        return np.array(rows, dtype='f4').reshape(-1, 8)
+
+
+class SdfTextRenderer(object):
+    InstanceSize = 13 * 4
+
+    def __init__(self, scene):
+        self._scene = scene
+        self._atlases = {}
+
+        self.ctx = scene.ctx
+        self.program = scene.textShaderProgram()
+        self.program['atlas'].value = 0
+        self.quad_vbo = self.ctx.buffer(np.array([0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 1.0], dtype='f4'))
+
+    def atlas(self, text_mesh: TextMesh) -> SdfFontAtlas:
+        """
+        Returns the glyph atlas for the text mesh font, building it the first time it is used
+        """
+        if text_mesh not in self._atlases:
+            self._atlases[text_mesh] = SdfFontAtlas(self.ctx, text_mesh)
+
+        return self._atlases[text_mesh]
+
+    def createInstances(self, lines: list[str], line_spacing: float, origin: tuple[float, float, float],
+                        scale: float, right=(1.0, 0.0, 0.0), down=(0.0, -1.0, 0.0),
+                        text_mesh: TextMesh = None) -> np.ndarray:
+        """
+        Returns one quad instance per character. right and down are the world
+        directions of the font's x and y axes
+        """
+        text_mesh = text_mesh or TextMesh.instance()
+        glyphs = self.atlas(text_mesh).layout(lines, line_spacing)
+
+        origin = np.array(origin, dtype='f4')
+        right = np.array(right, dtype='f4') * scale
+        down = np.array(down, dtype='f4') * scale
+
+        instances = np.empty((len(glyphs), 13), dtype='f4')
+        instances[:, 0:3] = origin + glyphs[:, 0:1] * right + glyphs[:, 1:2] * down
+        instances[:, 3:6] = glyphs[:, 2:3] * right
+        instances[:, 6:9] = glyphs[:, 3:4] * down
+        instances[:, 9:13] = glyphs[:, 4:8]
+
+        return instances
+
+    def createInstanceBuffer(self, lines: list[str], line_spacing: float, origin: tuple[float, float, float],
+                             scale: float, right=(1.0, 0.0, 0.0), down=(0.0, -1.0, 0.0),
+                             text_mesh: TextMesh = None) -> GL.Buffer or None:
+        """
+        Creates a buffer holding one quad instance per character
+        """
+        instances = self.createInstances(lines, line_spacing, origin, scale, right, down, text_mesh)
+
+        if not len(instances):
+            return None
+
+        return self.ctx.buffer(instances.tobytes())
+
+    def render(self, buffer: GL.Buffer or None, color, text_mesh: TextMesh = None):
+        if not buffer:
+            return
+
+        text_mesh = text_mesh or TextMesh.instance()
+
+        # Quads must be filled even when the scene is in wireframe mode
+        self._scene.renderQueue().submit(self.program, [
+            (self.quad_vbo, '2f', 'in_corner'),
+            (buffer, '3f 3f 3f 4f/i', 'in_pos', 'in_axis_x', 'in_axis_y', 'in_uv'),
+        ], GL.TRIANGLE_STRIP, {'color': color[:3], 'alphaValue': color[3] if len(color) > 3 else 1.0},
+            instances=buffer.size // SdfTextRenderer.InstanceSize,
+            textures=[(self.atlas(text_mesh).texture, 0)], filled=True)
@@ -0,0 +1,203 @@
+from src._imports import *
+
+
+class ScreenSpaceIndex(object):
+    """
+    Uniform grid over the projected positions of scene primitives (points, segments and
+    triangles), answering nearest item queries in screen space without a GPU round trip
+    """
+    PrimitivePoints = 0
+    PrimitiveSegments = 1
+    PrimitiveTriangles = 2
+    CellSize = 16
+
+    def __init__(self):
+        self._key = None
+        self._items = []
+        self._columns = 1
+        self._screen = {}
+        self._owners = {}
+        self._offsets = {}
+        self._cell_keys = np.empty(0, dtype='i8')
+        self._cell_primitives = np.empty(0, dtype='i8')
+
+    def isValid(self, key) -> bool:
+        return self._key == key
+
+    @staticmethod
+    def project(vertices: np.ndarray, matrix: np.ndarray, width: int, height: int) -> np.ndarray:
+        """
+        Projects world vertices to (x, y, depth) in widget pixels (origin top left)
+        """
+        clip = np.c_[vertices, np.ones(len(vertices))] @ matrix.astype('f8')
+        ndc = clip[:, :3] / clip[:, 3:4]
+
+        screen = np.empty((len(vertices), 3))
+        screen[:, 0] = (ndc[:, 0] + 1.0) * 0.5 * width
+        screen[:, 1] = (1.0 - ndc[:, 1]) * 0.5 * height
+        screen[:, 2] = ndc[:, 2]
+
+        # Anything clipped by the near/far planes can't be picked
+        screen[np.abs(ndc[:, 2]) > 1.0] = np.nan
+
+        return screen
+
+    def rebuild(self, items: list, matrix: np.ndarray, width: int, height: int, key):
+        """
+        Reprojects the pick geometry of the items and rebuilds the grid
+        """
+        self._key = key
+        self._items = items
+        self._columns = width // ScreenSpaceIndex.CellSize + 1
+
+        kinds = [ScreenSpaceIndex.PrimitivePoints, ScreenSpaceIndex.PrimitiveSegments,
+                 ScreenSpaceIndex.PrimitiveTriangles]
+        screens = {kind: [] for kind in kinds}
+        owners = {kind: [] for kind in kinds}
+
+        for item_index, item in enumerate(items):
+            geometry = item.pickGeometry()
+
+            if geometry is None:
+                continue
+
+            kind, array = geometry
+
+            if not len(array):
+                continue
+
+            vertices = np.asarray(array, dtype='f8').reshape(-1, 3)
+            screens[kind].append(self.project(vertices, matrix, width, height).reshape(array.shape))
+
+            # Each primitive remembers its item and its element index within the item
+            owner = np.empty((len(array), 2), dtype='i8')
+            owner[:, 0] = item_index
+            owner[:, 1] = np.arange(len(array))
+            owners[kind].append(owner)
+
+        shapes = {ScreenSpaceIndex.PrimitivePoints: (0, 3), ScreenSpaceIndex.PrimitiveSegments: (0, 2, 3),
+                  ScreenSpaceIndex.PrimitiveTriangles: (0, 3, 3)}
+        bounds = []
+        offset = 0
+
+        for kind in kinds:
+            self._screen[kind] = np.concatenate(screens[kind]) if screens[kind] else np.empty(shapes[kind])
+            self._owners[kind] = np.concatenate(owners[kind]) if owners[kind] else np.empty((0, 2), dtype='i8')
+            self._offsets[kind] = offset
+            offset += len(self._screen[kind])
+
+            screen = self._screen[kind]
+            if kind == ScreenSpaceIndex.PrimitivePoints:
+                bounds.append(np.c_[screen[:, :2], screen[:, :2]])
+            else:
+                bounds.append(np.c_[screen[:, :, :2].min(axis=1), screen[:, :, :2].max(axis=1)])
+
+        self.buildGrid(np.concatenate(bounds), width, height)
+
+    def buildGrid(self, bounds: np.ndarray, width: int, height: int):
+        """
+        Inserts every primitive into each grid cell its screen bounding box overlaps
+        """
+        cell = ScreenSpaceIndex.CellSize
+        ids = np.arange(len(bounds))
+
+        # Drop primitives that are off screen or not projectable
+        visible = (np.isfinite(bounds).all(axis=1) & (bounds[:, 2] >= 0) & (bounds[:, 3] >= 0) &
+                   (bounds[:, 0] < width) & (bounds[:, 1] < height))
+        ids = ids[visible]
+        bounds = bounds[visible]
+
+        cx0 = (np.clip(bounds[:, 0], 0, width - 1) // cell).astype('i8')
+        cy0 = (np.clip(bounds[:, 1], 0, height - 1) // cell).astype('i8')
+        cx1 = (np.clip(bounds[:, 2], 0, width - 1) // cell).astype('i8')
+        cy1 = (np.clip(bounds[:, 3], 0, height - 1) // cell).astype('i8')
+
+        # Expand each primitive into the cells of its bounding box
+        spans = cx1 - cx0 + 1
+        counts = spans * (cy1 - cy0 + 1)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        spans = np.repeat(spans, counts)
+        cx = np.repeat(cx0, counts) + local % spans
+        cy = np.repeat(cy0, counts) + local // spans
+
+        keys = cy * self._columns + cx
+        order = np.argsort(keys, kind='stable')
+        self._cell_keys = keys[order]
+        self._cell_primitives = np.repeat(ids, counts)[order]
+
+    def candidates(self, x: float, y: float, radius: float) -> np.ndarray:
+        cell = ScreenSpaceIndex.CellSize
+        cx = np.arange(max(0, int((x - radius) // cell)), min(self._columns, int((x + radius) // cell) + 1))
+        cy = np.arange(max(0, int((y - radius) // cell)), int((y + radius) // cell) + 1)
+        keys = (cy[:, None] * self._columns + cx[None, :]).ravel()
+
+        starts = np.searchsorted(self._cell_keys, keys, side='left')
+        stops = np.searchsorted(self._cell_keys, keys, side='right')
+
+        if not (stops - starts).any():
+            return np.empty(0, dtype='i8')
+
+        return np.unique(np.concatenate([self._cell_primitives[a:b] for a, b in zip(starts, stops)]))
+
+    def query(self, x: float, y: float, radius: float) -> tuple[object, int]:
+        """
+        Returns the item and element closest to the pixel within the radius. Points and
+        segments win over the triangles they sit on, overlapping triangles resolve by depth
+        """
+        primitives = self.candidates(x, y, radius)
+
+        if not len(primitives):
+            return None, -1
+
+        hits = []
+        for kind in [ScreenSpaceIndex.PrimitivePoints, ScreenSpaceIndex.PrimitiveSegments,
+                     ScreenSpaceIndex.PrimitiveTriangles]:
+            offset = self._offsets[kind]
+            local = primitives[(primitives >= offset) & (primitives < offset + len(self._screen[kind]))] - offset
+
+            if not len(local):
+                continue
+
+            distance, depth = self.measure(kind, self._screen[kind][local], x, y)
+            within = distance <= radius
+
+            for row, d, z in zip(local[within], distance[within], depth[within]):
+                hits.append((kind == ScreenSpaceIndex.PrimitiveTriangles, d, z, kind, row))
+
+        if not hits:
+            return None, -1
+
+        _, _, _, kind, row = min(hits)
+        item_index, element = self._owners[kind][row]
+
+        return self._items[item_index], int(element)
+
+    @staticmethod
+    def measure(kind: int, screen: np.ndarray, x: float, y: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the pixel distance from (x, y) to each primitive and the depth at the closest position
+        """
+        if kind == ScreenSpaceIndex.PrimitivePoints:
+            return np.hypot(screen[:, 0] - x, screen[:, 1] - y), screen[:, 2]
+
+        if kind == ScreenSpaceIndex.PrimitiveSegments:
+            a, b = screen[:, 0], screen[:, 1]
+            ab = b[:, :2] - a[:, :2]
+            length = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+            t = np.clip(((x - a[:, 0]) * ab[:, 0] + (y - a[:, 1]) * ab[:, 1]) / length, 0.0, 1.0)
+            closest = a + t[:, None] * (b - a)
+
+            return np.hypot(closest[:, 0] - x, closest[:, 1] - y), closest[:, 2]
+
+        # Barycentric coordinates of the pixel in each triangle
+        p0, p1, p2 = screen[:, 0], screen[:, 1], screen[:, 2]
+        denom = (p1[:, 1] - p2[:, 1]) * (p0[:, 0] - p2[:, 0]) + (p2[:, 0] - p1[:, 0]) * (p0[:, 1] - p2[:, 1])
+        denom = np.where(denom == 0, np.nan, denom)
+        l0 = ((p1[:, 1] - p2[:, 1]) * (x - p2[:, 0]) + (p2[:, 0] - p1[:, 0]) * (y - p2[:, 1])) / denom
+        l1 = ((p2[:, 1] - p0[:, 1]) * (x - p2[:, 0]) + (p0[:, 0] - p2[:, 0]) * (y - p2[:, 1])) / denom
+        l2 = 1.0 - l0 - l1
+
+        inside = (l0 >= 0) & (l1 >= 0) & (l2 >= 0)
+        depth = l0 * p0[:, 2] + l1 * p1[:, 2] + l2 * p2[:, 2]
+
+        return np.where(inside, 0.0, np.inf), depth
@@ -0,0 +1,193 @@
+from src._imports import *
+from src.framework.scene.metrics import metrics
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, depth_first_order
+
+
+class TerrainContours(object):
+    """
+    Contour lines of a triangulated surface by marching triangles. Every triangle and every
+    level it spans is handled in one NumPy pass, the segments are then stitched into polylines
+    through the triangle edges they share
+    """
+
+    def __init__(self, vertices: np.ndarray, starts: np.ndarray, counts: np.ndarray, levels: np.ndarray,
+                 major: np.ndarray):
+        self.vertices = vertices  # (n, 3) polyline vertices, one polyline after another
+        self.starts = starts
+        self.counts = counts
+        self.levels = levels
+        self.major = major
+
+    def __len__(self):
+        return len(self.starts)
+
+    def polylines(self):
+        """
+        Yields the (elevation, is major, (n, 3) vertices) of every contour polyline
+        """
+        for start, count, level, major in zip(self.starts, self.counts, self.levels, self.major):
+            yield float(level), bool(major), self.vertices[start:start + count]
+
+    @staticmethod
+    def create(points: np.ndarray, simplices: np.ndarray, minor_interval: float,
+               major_interval: float) -> 'TerrainContours':
+        """
+        Contours the surface every minor_interval, marking the levels on a multiple of
+        major_interval as major (runs on a worker thread)
+        """
+        start = metrics.now() if metrics.enabled else 0.0
+        points = np.asarray(points, dtype='f8')
+
+        segments, keys, level_indices = TerrainContours.segments(points, simplices, minor_interval)
+        contours = TerrainContours.stitch(segments, keys, level_indices, minor_interval, major_interval)
+
+        if metrics.enabled:
+            metrics.record('contours', ms=metrics.elapsedMs(start), segments=len(segments), polylines=len(contours))
+
+        return contours
+
+    @staticmethod
+    def segments(points: np.ndarray, simplices: np.ndarray,
+                 interval: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the (n, 2, 3) contour segments of every triangle at every level it spans, the
+        (n, 2, 3) keys (edge vertex, edge vertex, level) of their end points and their level indices
+        """
+        # Order each triangle's corners from low to high
+        z = points[:, 2][simplices]
+        order = np.argsort(z, axis=1, kind='stable')
+        corners = np.take_along_axis(simplices, order, axis=1)
+        za, zb, zc = np.take_along_axis(z, order, axis=1).T
+
+        # Levels k * interval with za <= level < zc, half open so a level through a corner is only cut once
+        first = np.ceil(za / interval).astype('i8')
+        counts = np.maximum(np.ceil(zc / interval).astype('i8') - first, 0)
+
+        triangle = np.repeat(np.arange(len(simplices)), counts)
+        level_indices = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                                                         counts)
+        level = level_indices * interval
+        a, b, c = corners[triangle].T
+        za, zb, zc = za[triangle], zb[triangle], zc[triangle]
+
+        # One end is always on the long edge a-c, the other on a-b below the middle corner or b-c above it
+        lower = level < zb
+        start, end = np.where(lower, a, b), np.where(lower, b, c)
+        z_start, z_end = np.where(lower, za, zb), np.where(lower, zb, zc)
+
+        t_long = ((level - za) / (zc - za))[:, None]
+        t_short = ((level - z_start) / (z_end - z_start))[:, None]
+
+        segments = np.empty((len(level), 2, 3))
+        segments[:, 0] = points[a] + t_long * (points[c] - points[a])
+        segments[:, 1] = points[start] + t_short * (points[end] - points[start])
+
+        # An end point is shared with the neighbouring triangle through its edge and level
+        keys = np.empty((len(level), 2, 3), dtype='i8')
+        keys[:, 0, 0], keys[:, 0, 1] = np.minimum(a, c), np.maximum(a, c)
+        keys[:, 1, 0], keys[:, 1, 1] = np.minimum(start, end), np.maximum(start, end)
+        keys[:, :, 2] = level_indices[:, None]
+
+        return segments, keys, level_indices
+
+    @staticmethod
+    def stitch(segments: np.ndarray, keys: np.ndarray, level_indices: np.ndarray, minor_interval: float,
+               major_interval: float) -> 'TerrainContours':
+        """
+        Joins the segments into polylines. Every end point key is shared by at most two segments,
+        so the contours form chains and loops that one depth first traversal walks in order
+        """
+        if not len(segments):
+            return TerrainContours(np.empty((0, 3)), np.empty(0, dtype='i8'), np.empty(0, dtype='i8'),
+                                   np.empty(0), np.empty(0, dtype=bool))
+
+        _, nodes = np.unique(keys.reshape(-1, 3), axis=0, return_inverse=True)
+        nodes = nodes.reshape(-1, 2)
+        node_count = int(nodes.max()) + 1
+
+        positions = np.empty((node_count, 3))
+        positions[nodes.ravel()] = segments.reshape(-1, 3)
+        node_levels = np.empty(node_count, dtype='i8')
+        node_levels[nodes[:, 0]] = level_indices
+
+        degree = np.bincount(nodes.ravel(), minlength=node_count)
+        starts = TerrainContours.chainStarts(nodes, node_count, degree)
+
+        # Start every open chain at one of its ends, and every loop anywhere on it, all from one extra root node
+        root = node_count
+        rows = np.r_[nodes[:, 0], np.full(len(starts), root)]
+        columns = np.r_[nodes[:, 1], starts]
+        graph = coo_matrix((np.ones(len(rows)), (rows, columns)), shape=(node_count + 1, node_count + 1)).tocsr()
+
+        order, predecessors = depth_first_order(graph, root, directed=False, return_predecessors=True)
+        order = order[1:]
+
+        # A new polyline begins wherever the traversal comes back to the root, loops end on their first node
+        begins = np.flatnonzero(predecessors[order] == root)
+        counts = np.diff(np.r_[begins, len(order)])
+        first_nodes = order[begins]
+        closed = degree[first_nodes] == 2
+
+        keep = counts > 1
+        begins, counts, first_nodes, closed = begins[keep], counts[keep], first_nodes[keep], closed[keep]
+
+        polyline_counts = counts + closed
+        polyline_starts = np.r_[0, np.cumsum(polyline_counts)[:-1]]
+
+        vertex_nodes = np.empty(int(polyline_counts.sum()), dtype='i8')
+        offsets = np.arange(len(vertex_nodes)) - np.repeat(polyline_starts, polyline_counts)
+        source = np.repeat(begins, polyline_counts) + np.minimum(offsets, np.repeat(counts, polyline_counts) - 1)
+        vertex_nodes[:] = order[source]
+        vertex_nodes[(polyline_starts + counts)[closed]] = first_nodes[closed]
+
+        levels = node_levels[first_nodes] * minor_interval
+        majors = levels / major_interval
+        major = np.isclose(majors, np.round(majors))
+
+        return TerrainContours(positions[vertex_nodes], polyline_starts, polyline_counts, levels, major)
+
+    @staticmethod
+    def chainStarts(nodes: np.ndarray, node_count: int, degree: np.ndarray) -> np.ndarray:
+        """
+        Returns one node per connected chain: an end node for open chains, any node of a loop
+        """
+        graph = coo_matrix((np.ones(len(nodes)), (nodes[:, 0], nodes[:, 1])), shape=(node_count, node_count))
+        _, components = connected_components(graph.tocsr(), directed=False)
+
+        # Ends sort before loop nodes, so the first node of each component is an end whenever it has one
+        order = np.lexsort((degree != 1, components))
+        _, first = np.unique(components[order], return_index=True)
+
+        return order[first]
+
+    def lineVertices(self, lift: float = 0.0) -> tuple[np.ndarray, int]:
+        """
+        Returns the float32 vertices of a line strip buffer with the major polylines first and the
+        polylines separated by NaN rows, and how many vertices the major part has
+        """
+        parts = []
+        major_vertices = 0
+
+        for major in (True, False):
+            selected = np.flatnonzero(self.major == major)
+
+            if not len(selected):
+                continue
+
+            counts = self.counts[selected] + 1  # Plus the separator
+            indices = np.repeat(self.starts[selected], counts) + np.arange(counts.sum()) - np.repeat(
+                np.cumsum(counts) - counts, counts)
+
+            vertices = self.vertices[np.minimum(indices, len(self.vertices) - 1)].copy()
+            vertices[np.cumsum(counts) - 1] = np.nan
+            vertices[:, 2] += lift
+            parts.append(vertices)
+
+            if major:
+                major_vertices = len(vertices)
+
+        if not parts:
+            return np.empty((0, 3), dtype='f4'), 0
+
+        return np.concatenate(parts).astype('f4'), major_vertices
@@ -0,0 +1,214 @@
+from src._imports import *
+from src.framework.scene.metrics import metrics
+from scipy.spatial import Delaunay
+
+
+class TerrainProfile(object):
+    """
+    Existing ground profile of a surface along an alignment: elevations at a fixed station
+    interval, at the alignment's vertices and at every crossing of a TIN edge, so the profile
+    is exact between samples. Crossings are found by walking the triangulation from triangle to
+    neighbour for all alignment pieces at once
+    """
+    DefaultInterval = 25.0
+    PieceEdgeLengths = 16  # Alignment segments are cut into pieces of about this many median TIN edges
+    MaximumSteps = 100000
+    HullEntryBlock = 256  # Pieces tested against every hull edge at once
+
+    def __init__(self, stations: np.ndarray, elevations: np.ndarray, xy: np.ndarray):
+        self.stations = stations
+        self.elevations = elevations
+        self.xy = xy
+
+    def __len__(self):
+        return len(self.stations)
+
+    @staticmethod
+    def alignmentPolyline(alignment) -> list[np.ndarray]:
+        """
+        Returns the (n, 2) vertices of every subpath of the alignment's horizontal path
+        """
+        polylines = []
+
+        for polygon in alignment.horizontalPath().toSubpathPolygons():
+            vertices = np.array([(point.x(), point.y()) for point in polygon], dtype='f8').reshape(-1, 2)
+
+            if len(vertices) > 1:
+                polylines.append(vertices)
+
+        return polylines
+
+    @staticmethod
+    def vertexStations(alignment, start_station: float = 0.0) -> np.ndarray:
+        """
+        Returns the station of every vertex of the alignment's horizontal path
+        """
+        stations = []
+        station = start_station
+
+        for polyline in TerrainProfile.alignmentPolyline(alignment):
+            lengths = np.hypot(*np.diff(polyline, axis=0).T)
+            stations.append(station + np.r_[0.0, np.cumsum(lengths)])
+            station += lengths.sum()
+
+        return np.concatenate(stations) if stations else np.empty(0)
+
+    @staticmethod
+    def sample(alignment, terrain, interval: float = DefaultInterval, start_station: float = 0.0) -> 'TerrainProfile':
+        """
+        Samples the terrain under the alignment, stations start at start_station and run on
+        across gaps between subpaths. Elevations off the surface are NaN
+        """
+        start = metrics.now() if metrics.enabled else 0.0
+        polylines = TerrainProfile.alignmentPolyline(alignment)
+
+        if not polylines:
+            return TerrainProfile(np.empty(0), np.empty(0), np.empty((0, 2)))
+
+        # Flatten the subpaths into segments with the station at their start
+        a = np.concatenate([polyline[:-1] for polyline in polylines])
+        b = np.concatenate([polyline[1:] for polyline in polylines])
+        lengths = np.hypot(*(b - a).T)
+        keep = lengths > 0
+        a, b, lengths = a[keep], b[keep], lengths[keep]
+        segment_stations = start_station + np.r_[0.0, np.cumsum(lengths)[:-1]]
+        end_station = start_station + lengths.sum()
+
+        tri = terrain.triangulation()
+        z = terrain.pointArray()[:, 2].astype('f8')
+
+        # Fixed interval and vertex stations, located on the segments
+        stations = np.unique(np.r_[np.arange(start_station, end_station, interval), segment_stations, end_station])
+        segment = np.clip(np.searchsorted(segment_stations, stations, side='right') - 1, 0, len(a) - 1)
+        u = np.clip((stations - segment_stations[segment]) / lengths[segment], 0.0, 1.0)
+        xy = a[segment] + u[:, None] * (b[segment] - a[segment])
+        elevations = terrain.getElevationsAt(xy)
+
+        # Exact break points where the alignment crosses the triangle edges
+        crossing_stations, crossing_xy, crossing_elevations = TerrainProfile.edgeCrossings(tri, z, a, b,
+                                                                                           segment_stations)
+
+        # Crossings on piece boundaries or vertices show up twice, keep one sample per station
+        stations, first = np.unique(np.r_[stations, crossing_stations], return_index=True)
+
+        profile = TerrainProfile(stations, np.r_[elevations, crossing_elevations][first],
+                                 np.r_[xy, crossing_xy][first])
+
+        if metrics.enabled:
+            metrics.record('terrain profile', ms=metrics.elapsedMs(start), samples=len(profile),
+                           crossings=len(crossing_stations))
+
+        return profile
+
+    @staticmethod
+    def edgeCrossings(tri: Delaunay, z: np.ndarray, a: np.ndarray, b: np.ndarray,
+                      segment_stations: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the station, position and elevation of every crossing of the segments a -> b with
+        a triangle edge, walking all segment pieces through the triangulation in lockstep
+        """
+        lengths = np.hypot(*(b - a).T)
+
+        # Short pieces keep the number of lockstep walking steps small
+        edges = tri.points[tri.simplices[:, 1]] - tri.points[tri.simplices[:, 0]]
+        piece_length = max(float(np.median(np.hypot(*edges.T))) * TerrainProfile.PieceEdgeLengths, 1e-9)
+        counts = np.maximum(np.ceil(lengths / piece_length).astype('i8'), 1)
+
+        owner = np.repeat(np.arange(len(a)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        u0 = local / counts[owner]
+        u1 = (local + 1) / counts[owner]
+        p = a[owner] + u0[:, None] * (b[owner] - a[owner])
+        q = a[owner] + u1[:, None] * (b[owner] - a[owner])
+        piece_stations = segment_stations[owner] + u0 * lengths[owner]
+        piece_lengths = (u1 - u0) * lengths[owner]
+
+        # Pieces starting off the surface begin where they enter the convex hull
+        simplex = tri.find_simplex(p)
+        u = np.zeros(len(p))
+        outside = np.flatnonzero(simplex < 0)
+
+        if len(outside):
+            entry = TerrainProfile.hullEntry(tri, p[outside], q[outside])
+            entered = entry < 1.0
+            outside, entry = outside[entered], entry[entered]
+            simplex[outside] = tri.find_simplex(p[outside] + (entry[:, None] + 1e-9) * (q[outside] - p[outside]))
+            u[outside] = entry
+
+        active = np.flatnonzero(simplex >= 0)
+        t = simplex[active]
+        u = u[active]
+        found_pieces, found_u, found_triangles = [], [], []
+
+        for _ in range(TerrainProfile.MaximumSteps):
+            if not len(active):
+                break
+
+            # Barycentric coordinates along the piece are linear, it leaves the triangle where one reaches 0
+            transform = tri.transform[t]
+            bp = TerrainProfile.barycentric(transform, p[active])
+            bq = TerrainProfile.barycentric(transform, q[active])
+            db = bq - bp
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                exits = np.where(db < -1e-15, -bp / db, np.inf)
+
+            side = np.argmin(exits, axis=1)
+            exit_u = np.maximum(exits[np.arange(len(active)), side], u)
+
+            crossed = exit_u < 1.0
+            found_pieces.append(active[crossed])
+            found_u.append(exit_u[crossed])
+            found_triangles.append(t[crossed])
+
+            # Step into the neighbour across the exit edge, the walk ends at the hull or the piece's end
+            t = tri.neighbors[t, side]
+            walking = crossed & (t >= 0)
+            active, t, u = active[walking], t[walking], exit_u[walking]
+
+        if not found_pieces:
+            return np.empty(0), np.empty((0, 2)), np.empty(0)
+
+        pieces = np.concatenate(found_pieces)
+        crossing_u = np.concatenate(found_u)
+        triangles = np.concatenate(found_triangles)
+
+        xy = p[pieces] + crossing_u[:, None] * (q[pieces] - p[pieces])
+        weights = TerrainProfile.barycentric(tri.transform[triangles], xy)
+        elevations = (np.clip(weights, 0.0, 1.0) * z[tri.simplices[triangles]]).sum(axis=1)
+
+        return piece_stations[pieces] + crossing_u * piece_lengths[pieces], xy, elevations
+
+    @staticmethod
+    def barycentric(transform: np.ndarray, xy: np.ndarray) -> np.ndarray:
+        b = np.einsum('nij,nj->ni', transform[:, :2], xy - transform[:, 2])
+
+        return np.c_[b, 1.0 - b.sum(axis=1)]
+
+    @staticmethod
+    def hullEntry(tri: Delaunay, p: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """
+        Returns the fraction along each segment p -> q where it first crosses the convex hull
+        of the triangulation (inf if it never does)
+        """
+        if len(p) > TerrainProfile.HullEntryBlock:
+            block = TerrainProfile.HullEntryBlock
+            return np.concatenate([TerrainProfile.hullEntry(tri, p[i:i + block], q[i:i + block])
+                                   for i in range(0, len(p), block)])
+
+        hull = tri.points[tri.convex_hull]
+        c, d = hull[:, 0], hull[:, 1]
+
+        # Segment/segment intersection of every piece with every hull edge
+        r = (q - p)[:, None, :]
+        s = (d - c)[None, :, :]
+        offset = c[None, :, :] - p[:, None, :]
+        denom = r[..., 0] * s[..., 1] - r[..., 1] * s[..., 0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = (offset[..., 0] * s[..., 1] - offset[..., 1] * s[..., 0]) / denom
+            v = (offset[..., 0] * r[..., 1] - offset[..., 1] * r[..., 0]) / denom
+
+        hits = (denom != 0) & (u >= 0) & (u <= 1) & (v >= 0) & (v <= 1)
+
+        return np.where(hits, u, np.inf).min(axis=1)
@@ -0,0 +1,120 @@
+from src._imports import *
+
+
+class TextMesh(object):
+    """
+    Process-wide cache of tessellated glyph outlines. Each character is converted to
+    polylines once and labels are assembled by offsetting the cached glyphs
+    """
+    SimplexFontPath = 'resources/fonts/Simplex.ttf'
+
+    _simplex_family = None
+    _instances = {}
+
+    def __init__(self, family: str, point_size: int):
+        self._font = QFont(family, point_size)
+        self._metrics = QFontMetricsF(self._font)
+        self._glyphs = {}
+        self._advances = {}
+
+    @staticmethod
+    def instance(family: str = None, point_size: int = 10) -> 'TextMesh':
+        """
+        Returns the shared text mesh for the font family and size (Simplex if no family is given)
+        """
+        if family is None:
+            family = TextMesh.simplexFamily()
+
+        key = (family, point_size)
+
+        if key not in TextMesh._instances:
+            TextMesh._instances[key] = TextMesh(family, point_size)
+
+        return TextMesh._instances[key]
+
+    @staticmethod
+    def simplexFamily() -> str:
+        """
+        Loads the Simplex font into the application font database (only once) and returns its family
+        """
+        if TextMesh._simplex_family is None:
+            font_id = QFontDatabase.addApplicationFont(TextMesh.SimplexFontPath)
+            TextMesh._simplex_family = QFontDatabase.applicationFontFamilies(font_id)[0]
+
+        return TextMesh._simplex_family
+
+    def font(self) -> QFont:
+        return self._font
+
+    def glyph(self, char: str) -> np.ndarray:
+        """
+        Returns the cached outline of a character as an (n, 2) array, with each
+        subpath terminated by a row of NaN
+        """
+        glyph = self._glyphs.get(char)
+
+        if glyph is None:
+            path = QPainterPath()
+            path.addText(QPointF(0, 0), self._font, char)
+
+            vertices = []
+            for polygon in path.toSubpathPolygons():
+                for point in polygon:
+                    vertices.append((point.x(), point.y()))
+
+                # Add a break in the drawing sequence
+                vertices.append((float('nan'), float('nan')))
+
+            glyph = np.array(vertices, dtype='f4').reshape(-1, 2)
+            self._glyphs[char] = glyph
+
+        return glyph
+
+    def cacheGlyphs(self, text: str):
+        """
+        Builds the outline and advance of every character in the text up front, so text can then
+        be assembled from the caches on a worker thread without touching the font
+        """
+        for char in set(text):
+            self.glyph(char)
+            self.advance(char)
+
+    def advance(self, char: str) -> float:
+        advance = self._advances.get(char)
+
+        if advance is None:
+            advance = self._metrics.horizontalAdvance(char)
+            self._advances[char] = advance
+
+        return advance
+
+    def lineVertices(self, text: str, y: float = 0.0) -> np.ndarray:
+        """
+        Assembles the outline of a single line of text by offsetting cached glyphs
+        """
+        pieces = []
+        pen_x = 0.0
+
+        for char in text:
+            glyph = self.glyph(char)
+
+            if len(glyph):
+                pieces.append(glyph + np.array([pen_x, y], dtype='f4'))
+
+            pen_x += self.advance(char)
+
+        if not pieces:
+            return np.empty((0, 2), dtype='f4')
+
+        return np.concatenate(pieces)
+
+    def textVertices(self, lines: list[str], line_spacing: float) -> np.ndarray:
+        """
+        Assembles the outline of several lines of text, each line moved down by line_spacing
+        """
+        pieces = [self.lineVertices(line, i * line_spacing) for i, line in enumerate(lines)]
+
+        if not pieces:
+            return np.empty((0, 2), dtype='f4')
+
+        return np.concatenate(pieces)
@@ -0,0 +1,121 @@
+from src._imports import *
+from src.framework.scene.metrics import metrics
+import struct
+import zlib
+
+
+class TiledExporter(object):
+    """
+    Renders the current view of a scene at a resolution larger than any framebuffer (e.g. a
+    600 dpi E-size plan sheet) by splitting the projection into tiles, and streams the tile
+    rows into a PNG on disk so the full image is never held in memory
+    """
+    DefaultTileSize = 2048
+    CompressionLevel = 6
+
+    def __init__(self, scene, tile_size: int = DefaultTileSize, samples: int = 4):
+        self._scene = scene
+        self._samples = samples
+
+        scene.makeCurrent()
+        ctx = scene.ctx
+        self._tile_size = max(16, min(tile_size, ctx.info.get('GL_MAX_RENDERBUFFER_SIZE', tile_size)))
+
+    def tileSize(self) -> int:
+        return self._tile_size
+
+    @staticmethod
+    def chunk(stream, kind: bytes, data: bytes):
+        stream.write(struct.pack('>I', len(data)))
+        stream.write(kind)
+        stream.write(data)
+        stream.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def export(self, path: str, width: int, height: int, dpi: float = None) -> bool:
+        """
+        Writes the view as a width x height RGB PNG, one band of tiles at a time, optionally
+        tagged with the print resolution in dots per inch
+        """
+        scene = self._scene
+        ctx = scene.ctx
+        camera = scene.sceneCamera()
+        size = self._tile_size
+
+        scene.makeCurrent()
+
+        # Every tile has to show the same meshes, so don't let background builds land mid export
+        scene.meshBuilder().wait()
+
+        # Draw multisampled, then resolve into a single sample framebuffer that can be read
+        color = ctx.renderbuffer((size, size), 4, samples=self._samples)
+        depth = ctx.depth_renderbuffer((size, size), samples=self._samples)
+        fbo = ctx.framebuffer(color_attachments=[color], depth_attachment=depth)
+        resolved = ctx.renderbuffer((size, size), 4)
+        resolve_fbo = ctx.framebuffer(color_attachments=[resolved])
+
+        previous_fbo = ctx.fbo
+        previous_viewport = ctx.viewport
+        start = metrics.now() if metrics.enabled else 0.0
+
+        try:
+            with open(path, 'wb') as stream:
+                stream.write(b'\x89PNG\r\n\x1a\n')
+                self.chunk(stream, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+                if dpi:
+                    pixels_per_metre = int(round(dpi / 0.0254))
+                    self.chunk(stream, b'pHYs', struct.pack('>IIB', pixels_per_metre, pixels_per_metre, 1))
+
+                compressor = zlib.compressobj(TiledExporter.CompressionLevel)
+
+                for y in range(0, height, size):
+                    band_height = min(size, height - y)
+                    band = np.zeros((band_height, width * 3 + 1), dtype=np.uint8)  # Filter byte, then RGB
+
+                    for x in range(0, width, size):
+                        tile_width = min(size, width - x)
+                        tile = self.renderTile(fbo, resolve_fbo, (width, height), (x, y, tile_width, band_height))
+                        band[:, 1 + x * 3:1 + (x + tile_width) * 3] = tile.reshape(band_height, -1)
+
+                    data = compressor.compress(band.tobytes())
+                    if data:
+                        self.chunk(stream, b'IDAT', data)
+
+                self.chunk(stream, b'IDAT', compressor.flush())
+                self.chunk(stream, b'IEND', b'')
+
+        except OSError:
+            return False
+
+        finally:
+            camera.setTile(None)
+            camera.update()
+
+            previous_fbo.use()
+            ctx.viewport = previous_viewport
+
+            for resource in (fbo, resolve_fbo, color, depth, resolved):
+                resource.release()
+
+        if metrics.enabled:
+            metrics.record('tiled export', ms=metrics.elapsedMs(start), width=width, height=height,
+                           tiles=-(-width // size) * -(-height // size))
+
+        return True
+
+    def renderTile(self, fbo: GL.Framebuffer, resolve_fbo: GL.Framebuffer, image_size: tuple[int, int],
+                   rect: tuple[int, int, int, int]) -> np.ndarray:
+        """
+        Draws the part of the image inside the rect and returns it as a (height, width, 3) array, top row first
+        """
+        _, _, width, height = rect
+        self._scene.sceneCamera().setTile(image_size, rect)
+
+        fbo.use()
+        self._scene.ctx.viewport = (0, 0, width, height)
+        self._scene.renderScene()
+
+        self._scene.ctx.copy_framebuffer(resolve_fbo, fbo)
+        data = resolve_fbo.read(viewport=(0, 0, width, height), components=3, alignment=1)
+
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)[::-1]
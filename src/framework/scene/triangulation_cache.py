@@ -0,0 +1,223 @@
+from src._imports import *
+from src.framework.scene.metrics import metrics
+from scipy.spatial import Delaunay, cKDTree
+import collections
+import hashlib
+import threading
+
+
+class StoredTriangulation(object):
+    """
+    A 2D triangulation read back from the disk cache. Offers the parts of Delaunay the surface
+    code uses (points, simplices, neighbors, transform, convex_hull, find_simplex) from plain
+    arrays, so loading it never runs Qhull or unpickles anything
+    """
+    MaximumWalkSteps = 1000  # Walks start next to their point, so they only take a few steps
+
+    def __init__(self, points: np.ndarray, simplices: np.ndarray, neighbors: np.ndarray):
+        self.points = points
+        self.simplices = simplices
+        self.neighbors = neighbors
+        self.transform = StoredTriangulation.barycentricTransform(points, simplices)
+        self._tree = None
+        self._vertex_simplex = None
+
+    @staticmethod
+    def barycentricTransform(points: np.ndarray, simplices: np.ndarray) -> np.ndarray:
+        """
+        Returns the (n, 3, 2) affine transforms to barycentric coordinates, laid out like Delaunay.transform
+        (NaN for degenerate triangles)
+        """
+        p0, p1, p2 = (points[simplices[:, i]] for i in range(3))
+        a, b = p0[:, 0] - p2[:, 0], p1[:, 0] - p2[:, 0]
+        c, d = p0[:, 1] - p2[:, 1], p1[:, 1] - p2[:, 1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_det = np.where(a * d - b * c != 0, 1.0 / (a * d - b * c), np.nan)
+
+        transform = np.empty((len(simplices), 3, 2))
+        transform[:, 0, 0], transform[:, 0, 1] = d * inverse_det, -b * inverse_det
+        transform[:, 1, 0], transform[:, 1, 1] = -c * inverse_det, a * inverse_det
+        transform[:, 2] = p2
+
+        return transform
+
+    @property
+    def convex_hull(self) -> np.ndarray:
+        # Hull edges are the ones without a neighbour, opposite the corner they are listed against
+        simplex, corner = np.nonzero(self.neighbors < 0)
+
+        return np.c_[self.simplices[simplex, (corner + 1) % 3], self.simplices[simplex, (corner + 2) % 3]]
+
+    def find_simplex(self, xi: np.ndarray, tol: float = None) -> np.ndarray:
+        """
+        Returns the triangle containing each point, -1 outside the triangulation. Every point walks from a
+        triangle at its nearest vertex towards the edge it is furthest outside of, leaving through a hull edge
+        means it is outside the (convex) triangulation
+        """
+        xi = np.asarray(xi, dtype='f8').reshape(-1, 2)
+        tol = 100 * np.finfo(float).eps if tol is None else tol
+
+        if self._tree is None:
+            used = np.unique(self.simplices)
+            self._vertex_simplex = np.empty(len(self.points), dtype='i8')
+            self._vertex_simplex[self.simplices.ravel()] = np.repeat(np.arange(len(self.simplices)), 3)
+            self._tree = (cKDTree(self.points[used]), used)
+
+        tree, used = self._tree
+        result = np.full(len(xi), -1, dtype='i8')
+
+        if not len(xi) or not len(self.simplices):
+            return result
+
+        active = np.flatnonzero(np.isfinite(xi).all(axis=1))
+        t = self._vertex_simplex[used[tree.query(xi[active])[1]]]
+
+        for _ in range(StoredTriangulation.MaximumWalkSteps):
+            if not len(active):
+                break
+
+            transform = self.transform[t]
+            b = np.einsum('nij,nj->ni', transform[:, :2], xi[active] - transform[:, 2])
+            b = np.nan_to_num(np.c_[b, 1.0 - b.sum(axis=1)], nan=-np.inf)
+
+            inside = (b >= -tol).all(axis=1)
+            result[active[inside]] = t[inside]
+
+            t = self.neighbors[t, np.argmin(b, axis=1)]
+            walking = ~inside & (t >= 0)
+            active, t = active[walking], t[walking]
+
+        return result
+
+
+class TriangulationCache(object):
+    """
+    Process-wide cache of Delaunay triangulations keyed by a hash of the triangulated (x, y)
+    coordinates, so surfaces rebuilt from the same points (undo, redo, elevation edits, reimports)
+    never rerun Qhull. Set DOT39_TRIANGULATION_CACHE to a directory to keep them between sessions,
+    they are stored as plain arrays and read back as a StoredTriangulation
+    """
+    CapacityPoints = 8000000  # Least recently used triangulations are dropped past this many points
+    FileSuffix = '.npz'
+
+    _triangulations = collections.OrderedDict()
+    _lock = threading.Lock()
+    _directory = os.environ.get('DOT39_TRIANGULATION_CACHE') or None
+
+    @staticmethod
+    def setDirectory(directory: str or None):
+        """
+        Sets the directory triangulations are persisted in, None keeps them in memory only
+        """
+        TriangulationCache._directory = directory
+
+    @staticmethod
+    def directory() -> str or None:
+        return TriangulationCache._directory
+
+    @staticmethod
+    def contentHash(points: np.ndarray) -> str:
+        xy = np.ascontiguousarray(points[:, :2], dtype='f8')
+
+        digest = hashlib.blake2b(xy.tobytes(), digest_size=16)
+        digest.update(str(xy.shape).encode())
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def triangulate(points: np.ndarray) -> Delaunay or StoredTriangulation:
+        """
+        Returns the triangulation of the points' (x, y) coordinates, from memory or disk when the
+        same points were triangulated before. Safe to call from worker threads
+        """
+        key = TriangulationCache.contentHash(points)
+
+        with TriangulationCache._lock:
+            tri = TriangulationCache._triangulations.get(key)
+
+            if tri is not None:
+                TriangulationCache._triangulations.move_to_end(key)
+
+                if metrics.enabled:
+                    metrics.record('triangulation', points=len(points), source='memory')
+
+                return tri
+
+        start = metrics.now() if metrics.enabled else 0.0
+        tri = TriangulationCache.load(key, points)
+        source = 'disk'
+
+        if tri is None:
+            tri = Delaunay(np.asarray(points[:, :2], dtype='f8'))
+            tri.transform  # Computed lazily otherwise, build it now so it's shared between threads
+            source = 'qhull'
+
+            TriangulationCache.save(key, tri)
+
+        with TriangulationCache._lock:
+            TriangulationCache._triangulations[key] = tri
+
+            total = sum(len(t.points) for t in TriangulationCache._triangulations.values())
+            while total > TriangulationCache.CapacityPoints and len(TriangulationCache._triangulations) > 1:
+                _, dropped = TriangulationCache._triangulations.popitem(last=False)
+                total -= len(dropped.points)
+
+        if metrics.enabled:
+            metrics.record('triangulation', points=len(points), source=source, ms=metrics.elapsedMs(start))
+
+        return tri
+
+    @staticmethod
+    def path(key: str) -> str or None:
+        if TriangulationCache._directory is None:
+            return None
+
+        return os.path.join(TriangulationCache._directory, key + TriangulationCache.FileSuffix)
+
+    @staticmethod
+    def load(key: str, points: np.ndarray) -> StoredTriangulation or None:
+        path = TriangulationCache.path(key)
+
+        if path is None or not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                xy, simplices, neighbors = data['points'], data['simplices'], data['neighbors']
+
+            # Only trust a file that triangulates exactly these points and is internally consistent
+            valid = (np.array_equal(xy, np.asarray(points[:, :2], dtype='f8'))
+                     and simplices.ndim == 2 and simplices.shape[1] == 3 and neighbors.shape == simplices.shape
+                     and (not simplices.size or (simplices.min() >= 0 and simplices.max() < len(xy)))
+                     and (not neighbors.size or (neighbors.min() >= -1 and neighbors.max() < len(simplices))))
+
+            return StoredTriangulation(xy, simplices.astype('i4'), neighbors.astype('i4')) if valid else None
+
+        except Exception:
+            # Unreadable, truncated or foreign files are a cache miss, they are triangulated again and overwritten
+            return None
+
+    @staticmethod
+    def save(key: str, tri: Delaunay):
+        path = TriangulationCache.path(key)
+
+        if path is None:
+            return
+
+        try:
+            os.makedirs(TriangulationCache._directory, exist_ok=True)
+
+            # Write beside the final file and rename, so a crash never leaves half a triangulation behind
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f, points=tri.points, simplices=tri.simplices, neighbors=tri.neighbors)
+
+            os.replace(path + '.tmp', path)
+
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def clear():
+        with TriangulationCache._lock:
+            TriangulationCache._triangulations.clear()
@@ -50,29 +50,31 @@ class SurfaceToPointsCommand(QUndoCommand):
 
 
 class EditPointsCommand(QUndoCommand):
-    def __init__(self, point_group, old_attr: list[dict], new_attr: list[dict]):
+    def __init__(self, point_group, old_attr: dict[int, dict], new_attr: dict[int, dict]):
         super().__init__()
 
         self.point_group = point_group
-        self.point_items = point_group.points()
         self.old_attr = old_attr
         self.new_attr = new_attr
 
     def redo(self):
-        for point, new_attributes in zip(self.point_items, self.new_attr):
+        for index, new_attributes in self.new_attr.items():
+            point = self.point_group.point(index)
             point.setPointNumber(new_attributes['num'])
             point.setPos([new_attributes['east'], new_attributes['north'], new_attributes['elev']])
             point.setName(new_attributes['desc'])
 
-        self.point_group.update()
+        # Only the edited points are rewritten on the GPU
+        self.point_group.markPointsDirty(self.new_attr.keys())
 
     def undo(self):
-        for point, old_attributes in zip(self.point_items, self.old_attr):
+        for index, old_attributes in self.old_attr.items():
+            point = self.point_group.point(index)
             point.setPointNumber(old_attributes['num'])
             point.setPos([old_attributes['east'], old_attributes['north'], old_attributes['elev']])
             point.setName(old_attributes['desc'])
 
-        self.point_group.update()
+        self.point_group.markPointsDirty(self.old_attr.keys())
 
 
 class EditHorizontalAlignmentCommand(QUndoCommand):
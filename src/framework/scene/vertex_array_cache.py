@@ -0,0 +1,74 @@
+from src._imports import *
+
+
+class VertexArrayCache(object):
+    def __init__(self, ctx: GL.Context):
+        self._ctx = ctx
+        self._vertex_arrays = {}
+        self._buffer_keys = {}
+
+    def vertexArray(self, program: GL.Program, content: list[tuple], index_buffer: GL.Buffer = None) -> GL.VertexArray:
+        """
+        Returns the cached vertex array for the program, buffer and format combination,
+        creating it the first time it is requested
+        """
+        key = (program.glo,
+               tuple((buffer.glo, *attributes) for buffer, *attributes in content),
+               index_buffer.glo if index_buffer else None)
+
+        vao = self._vertex_arrays.get(key)
+
+        if vao is None:
+            vao = self._ctx.vertex_array(program, content, index_buffer=index_buffer)
+            self._vertex_arrays[key] = vao
+
+            buffers = [buffer for buffer, *_ in content]
+            if index_buffer:
+                buffers.append(index_buffer)
+
+            for buffer in buffers:
+                self._buffer_keys.setdefault(buffer.glo, set()).add(key)
+
+        return vao
+
+    def releaseVertexArrays(self, buffer: GL.Buffer):
+        """
+        Releases every cached vertex array that references the buffer, keeping the buffer itself
+        """
+        for key in self._buffer_keys.pop(buffer.glo, ()):
+            vao = self._vertex_arrays.pop(key, None)
+
+            if vao:
+                vao.release()
+
+            # The other buffers of the vertex array no longer need to point at it
+            _, content, index_glo = key
+            for glo in [glo for glo, *_ in content] + ([index_glo] if index_glo is not None else []):
+                keys = self._buffer_keys.get(glo)
+
+                if keys is not None:
+                    keys.discard(key)
+
+                    if not keys:
+                        del self._buffer_keys[glo]
+
+    def releaseBuffer(self, buffer: GL.Buffer):
+        """
+        Releases the buffer along with every cached vertex array that references it
+        """
+        self.releaseVertexArrays(buffer)
+
+        buffer.release()
+
+    def clear(self):
+        """
+        Releases every cached vertex array
+        """
+        for vao in self._vertex_arrays.values():
+            vao.release()
+
+        self._vertex_arrays.clear()
+        self._buffer_keys.clear()
+
+    def count(self) -> int:
+        return len(self._vertex_arrays)
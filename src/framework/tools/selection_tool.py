@@ -10,22 +10,23 @@ class SelectionTool(BaseTool):
     def mousePress(self, event: QMouseEvent):
         item = self.scene().itemAt(event.x(), event.y())
 
-        if item:
-            if event.modifiers() & Qt.KeyboardModifier.ShiftModifier:
-                if item.isSelected():
-                    item.setSelected(False)
+        with self.scene().batchUpdate():
+            if item:
+                if event.modifiers() & Qt.KeyboardModifier.ShiftModifier:
+                    if item.isSelected():
+                        item.setSelected(False)
 
-                else:
-                    item.setSelected(True)
+                    else:
+                        item.setSelected(True)
 
-                self.scene().update()
-                return
+                    self.scene().update()
+                    return
 
-            self.clearSelection()
-            item.setSelected(True)
+                self.clearSelection()
+                item.setSelected(True)
 
-        else:
-            self.clearSelection()
+            else:
+                self.clearSelection()
 
     def mouseMove(self, event: QMouseEvent):
         # Item hover effect logic
@@ -38,10 +39,11 @@ class SelectionTool(BaseTool):
             self.clearHover()
 
     def selectAll(self):
-        self.clearSelection()
+        with self.scene().batchUpdate():
+            self.clearSelection()
 
-        for item in self.scene().visibleItems():
-            item.setSelected(True)
+            for item in self.scene().visibleItems():
+                item.setSelected(True)
 
     def unhideAll(self):
         items = []
@@ -76,10 +78,11 @@ class SelectionTool(BaseTool):
             self.scene().addUndoCommand(VisibilityChangedCommand(items, new_attr, old_attr))
 
     def clearSelection(self):
-        for item in self.scene().items():
-            item.setSelected(False)
+        with self.scene().batchUpdate():
+            for item in self.scene().items():
+                item.setSelected(False)
 
-        self.scene().update()
+            self.scene().update()
 
     def clearHover(self):
         for item in self.scene().items():
@@ -1,6 +1,7 @@
 from src._imports import *
 from src.framework.items.alignment_item import AlignmentItem
 from src.framework.items.terrain_item import TerrainItem
+from src.framework.scene.terrain_profile import TerrainProfile
 from src.framework.viewers.items import EllipsePointItem, BoundingBoxItem
 
 
@@ -31,33 +32,50 @@ class VerticalAlignmentViewer(QGraphicsView):
             item.setPen(QPen(QColor('#ff0000'), 1))
             self._graphics_scene.addItem(self.alignment_item.verticalPath())
 
-        max_x = float('-inf')
-        max_z = float('-inf')
-        min_x = float('inf')
-        min_z = float('inf')
-
-        for i in range(self.alignment_item.horizontalPath().elementCount()):
-            x, y = self.alignment_item.coordAt(i)
-
-            if self.terrain_item.getElevationAt(x, y):
-                z = self.terrain_item.getElevationAt(x, y)
-
-                # Track the max X and Z values
-                max_x = max(max_x, x)
-                max_z = max(max_z, z)
-                min_x = min(min_x, x)
-                min_z = min(min_z, z)
-
-                item = EllipsePointItem('#00ff00', bottom=True, rect=QRectF(1, 1, -1, -1))
-                item.setScale(0.25)
-                item.setX(x)
-                item.setY(z)
-                self._graphics_scene.addItem(item)
-
-        rect = BoundingBoxItem(bottom=True, rect=QRectF(self.alignment_item.horizontalPath().elementAt(0).x,
-                                                        100000 - min_z,
-                                                        self.alignment_item.horizontalPath().currentPosition().x(),
-                                                        -100000))
+        # Existing ground along the alignment, sampled at every TIN edge crossing so it is exact
+        profile = TerrainProfile.sample(self.alignment_item, self.terrain_item)
+        on_surface = ~np.isnan(profile.elevations)
+
+        if not on_surface.any():
+            return
+
+        stations, elevations = profile.stations[on_surface], profile.elevations[on_surface]
+        min_x, max_x = float(stations.min()), float(stations.max())
+        min_z, max_z = float(elevations.min()), float(elevations.max())
+
+        # Break the ground line where the alignment runs off the surface
+        ground = QPainterPath()
+        pen_down = False
+        for station, z in zip(profile.stations, profile.elevations):
+            if np.isnan(z):
+                pen_down = False
+
+            elif pen_down:
+                ground.lineTo(station, z)
+
+            else:
+                ground.moveTo(station, z)
+                pen_down = True
+
+        ground_item = QGraphicsPathItem(ground)
+        ground_item.setPen(QPen(QColor('#00ff00'), 0))
+        ground_item.setZValue(-10000)
+        self._graphics_scene.addItem(ground_item)
+
+        # Mark the alignment's vertices on the profile, leaving out the ones off the surface
+        vertices = TerrainProfile.vertexStations(self.alignment_item)
+        vertex_xy = np.concatenate(TerrainProfile.alignmentPolyline(self.alignment_item))
+        for station, z in zip(vertices, self.terrain_item.getElevationsAt(vertex_xy)):
+            if np.isnan(z):
+                continue
+
+            item = EllipsePointItem('#00ff00', bottom=True, rect=QRectF(1, 1, -1, -1))
+            item.setScale(0.25)
+            item.setX(station)
+            item.setY(z)
+            self._graphics_scene.addItem(item)
+
+        rect = BoundingBoxItem(bottom=True, rect=QRectF(min_x, 100000 - min_z, max_x - min_x, -100000))
         self._graphics_scene.addItem(rect)
 
         self._graphics_scene.setSceneRect(min_x, min_z, max_x - min_x, max_z - min_z)
@@ -23,9 +23,8 @@ class GetPointGroupDialog(QDialog):
     def createPotentialList(self):
         self.potential_list = {}
 
-        for item in self.scene.items():
-            if isinstance(item, PointGroupItem):
-                self.potential_list[item.name()] = item
+        for item in self.scene.itemsOfType(PointGroupItem):
+            self.potential_list[item.name()] = item
 
     def createUI(self):
         self.setLayout(QVBoxLayout())
@@ -80,9 +79,8 @@ class GetAlignmentDialog(QDialog):
     def createPotentialList(self):
         self.potential_list = {}
 
-        for item in self.scene.items():
-            if isinstance(item, AlignmentItem):
-                self.potential_list[item.name()] = item
+        for item in self.scene.itemsOfType(AlignmentItem):
+            self.potential_list[item.name()] = item
 
     def createUI(self):
         self.setLayout(QVBoxLayout())
@@ -137,9 +135,8 @@ class GetTerrainDialog(QDialog):
     def createPotentialList(self):
         self.potential_list = {}
 
-        for item in self.scene.items():
-            if isinstance(item, TerrainItem):
-                self.potential_list[item.name()] = item
+        for item in self.scene.itemsOfType(TerrainItem):
+            self.potential_list[item.name()] = item
 
     def createUI(self):
         self.setLayout(QVBoxLayout())
@@ -218,7 +215,7 @@ class EditPointGroupDialog(QDialog):
 
         for point in self.point_group.points():
             point_attr = {
-                'num': point.pointNumber(),
+                'num': f'{point.pointNumber()}',
                 'north': point.y(),
                 'east': point.x(),
                 'elev': point.z(),
@@ -242,34 +239,45 @@ class EditPointGroupDialog(QDialog):
 
         self.editor.cellChanged.connect(self.applyChanges)
 
-    def applyChanges(self):
-        new_point_attr = []
+    def applyChanges(self, row: int, column: int):
+        try:
+            # Extract values from the table items for the edited row, point numbers are free text (A101, CP-3)
+            num = self.editor.item(row, 0).text().strip()
+            north = float(self.editor.item(row, 1).text())
+            east = float(self.editor.item(row, 2).text())
+            elev = float(self.editor.item(row, 3).text())
+            desc = self.editor.item(row, 4).text()
 
-        # Iterate through each row of the table
-        for row in range(self.editor.rowCount()):
-            try:
-                # Extract values from the table items for the current row
-                num = int(self.editor.item(row, 0).text())
-                north = float(self.editor.item(row, 1).text())
-                east = float(self.editor.item(row, 2).text())
-                elev = float(self.editor.item(row, 3).text())
-                desc = self.editor.item(row, 4).text()
-
-                # Create a dictionary similar to point_attr
-                point_attr = {
-                    'num': num,
-                    'north': north,
-                    'east': east,
-                    'elev': elev,
-                    'desc': desc
-                }
-                new_point_attr.append(point_attr)
-            except:
-                pass
-
-        self.scene.addUndoCommand(EditPointsCommand(self.point_group, self.og_point_attr, new_point_attr))
-
-        self.og_point_attr = new_point_attr
+        except:
+            return
+
+        if not num:
+            return
+
+        og_point_attr = self.og_point_attr[row]
+
+        # Create a dictionary similar to point_attr
+        point_attr = {
+            'num': num,
+            'north': north,
+            'east': east,
+            'elev': elev,
+            'desc': desc
+        }
+
+        # The table shows coordinates rounded to 4 places, keep the exact value of any that weren't edited
+        for key in ('north', 'east', 'elev'):
+            if round(point_attr[key], 4) == round(og_point_attr[key], 4):
+                point_attr[key] = og_point_attr[key]
+
+        if point_attr == og_point_attr:
+            return
+
+        self.scene.addUndoCommand(EditPointsCommand(self.point_group,
+                                                    {row: self.og_point_attr[row]},
+                                                    {row: point_attr}))
+
+        self.og_point_attr[row] = point_attr
 
 
 class EditAlignmentDialog(QDialog):
@@ -500,7 +508,7 @@ class AlignmentCreatorDialog(QDialog):
 
     def close(self, remove=False):
         if remove:
-            self.scene.removeItem(self._alignment_item)
+            self.scene.removeItem(self._alignment_item, release=True)
             self.parent().alignment_item_count -= 1
 
         super().close()
@@ -629,3 +637,64 @@ class EditValueDialog(QDialog):
             ))
 
         self.close()
+
+
+class ExportImageDialog(QDialog):
+    MaximumSize = 65535  # PNG dimensions are stored in 32 bits, this keeps the tile count sane
+
+    def __init__(self, scene, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Export Image')
+        self.setWindowModality(Qt.WindowModality.ApplicationModal)
+        self.resize(300, 175)
+
+        self.scene = scene
+
+        self.createUI()
+
+    def createUI(self):
+        self.setLayout(QVBoxLayout())
+
+        # Default to four times the view, keeping its aspect ratio
+        self.width_input = IntegerInput('Width', (16, ExportImageDialog.MaximumSize), QHBoxLayout(), suffix=' px')
+        self.width_input.setDefaultValue(self.scene.width() * 4)
+        self.height_input = IntegerInput('Height', (16, ExportImageDialog.MaximumSize), QHBoxLayout(), suffix=' px')
+        self.height_input.setDefaultValue(self.scene.height() * 4)
+        self.dpi_input = FloatInput('Resolution', (1, 2400), QHBoxLayout(), step=50, suffix=' dpi')
+        self.dpi_input.setDefaultValue(300)
+
+        self.button_group = QDialogButtonBox(self)
+        self.button_group.addButton('Export', QDialogButtonBox.AcceptRole)
+        self.button_group.addButton('Cancel', QDialogButtonBox.RejectRole)
+        self.button_group.accepted.connect(self.accept)
+        self.button_group.rejected.connect(self.close)
+
+        self.layout().addWidget(self.width_input)
+        self.layout().addWidget(self.height_input)
+        self.layout().addWidget(self.dpi_input)
+        self.layout().addStretch()
+        self.layout().addWidget(self.button_group)
+
+    def accept(self):
+        file, _ = QFileDialog.getSaveFileName(self, 'Export Image', '', 'PNG Image (*.png)')
+
+        if not file:
+            return
+
+        if not file.lower().endswith('.png'):
+            file += '.png'
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+
+        try:
+            exported = self.scene.exportImage(file, self.width_input.value(), self.height_input.value(),
+                                              self.dpi_input.value())
+
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if not exported:
+            QMessageBox.warning(self, 'Export Image', f'Could not write {file}')
+            return
+
+        self.close()
@@ -1,5 +1,5 @@
 from src._imports import *
-from src.gui.widgets import ToolBarContainer, AnimatedLabel, ColorButton, ColorInput
+from src.gui.widgets import ToolBarContainer, AnimatedLabel, ColorButton, ColorInput, FloatInput
 from src.framework.items.point_group import PointGroupItem
 from src.framework.items.terrain_item import TerrainItem
 from src.framework.items.alignment_item import AlignmentItem
@@ -61,11 +61,66 @@ class ScenePanel(BasePanel):
         view_type_container = ToolBarContainer('View Mode', [wireframe_btn, solid_btn])
         view_type_container.layout().setContentsMargins(0, 0, 0, 10)
 
+        outline_text_btn = QPushButton('Outline')
+        outline_text_btn.setCheckable(True)
+        outline_text_btn.setChecked(True)
+        outline_text_btn.clicked.connect(self.changeLabelMode)
+        sdf_text_btn = QPushButton('SDF')
+        sdf_text_btn.setCheckable(True)
+        sdf_text_btn.clicked.connect(self.changeLabelMode)
+        self.label_mode_btn_group = QButtonGroup(self)
+        self.label_mode_btn_group.addButton(outline_text_btn)
+        self.label_mode_btn_group.addButton(sdf_text_btn)
+        label_mode_container = ToolBarContainer('Label Mode', [outline_text_btn, sdf_text_btn])
+        label_mode_container.layout().setContentsMargins(0, 0, 0, 10)
+
+        gpu_picking_btn = QPushButton('GPU')
+        gpu_picking_btn.setCheckable(True)
+        gpu_picking_btn.setChecked(True)
+        gpu_picking_btn.clicked.connect(self.changePickingMode)
+        cpu_picking_btn = QPushButton('CPU')
+        cpu_picking_btn.setCheckable(True)
+        cpu_picking_btn.clicked.connect(self.changePickingMode)
+        self.picking_mode_btn_group = QButtonGroup(self)
+        self.picking_mode_btn_group.addButton(gpu_picking_btn)
+        self.picking_mode_btn_group.addButton(cpu_picking_btn)
+        picking_mode_container = ToolBarContainer('Picking Mode', [gpu_picking_btn, cpu_picking_btn])
+        picking_mode_container.layout().setContentsMargins(0, 0, 0, 10)
+
+        contours_on_btn = QPushButton('On')
+        contours_on_btn.setCheckable(True)
+        contours_on_btn.setChecked(self.scene.contoursVisible())
+        contours_on_btn.clicked.connect(self.changeContourMode)
+        contours_off_btn = QPushButton('Off')
+        contours_off_btn.setCheckable(True)
+        contours_off_btn.setChecked(not self.scene.contoursVisible())
+        contours_off_btn.clicked.connect(self.changeContourMode)
+        self.contour_mode_btn_group = QButtonGroup(self)
+        self.contour_mode_btn_group.addButton(contours_on_btn)
+        self.contour_mode_btn_group.addButton(contours_off_btn)
+        contour_container = ToolBarContainer('Contours', [contours_on_btn, contours_off_btn])
+        contour_container.layout().setContentsMargins(0, 0, 0, 10)
+
+        minor_interval, major_interval = self.scene.contourIntervals()
+        self.minor_interval_input = None
+        self.major_interval_input = None
+        self.minor_interval_input = FloatInput('Minor Interval:', (0.1, 1000.0), QHBoxLayout(), step=0.5,
+                                               on_change=self.changeContourIntervals)
+        self.minor_interval_input.setDefaultValue(minor_interval)
+        self.major_interval_input = FloatInput('Major Interval:', (0.1, 1000.0), QHBoxLayout(), step=1.0,
+                                               on_change=self.changeContourIntervals)
+        self.major_interval_input.setDefaultValue(major_interval)
+        contour_container.addRow([self.minor_interval_input])
+        contour_container.addRow([self.major_interval_input])
+
         scene_background_color_btn = ColorInput('Background Color:',
                                                 QHBoxLayout(),
                                                 on_change=self.scene.setBackgroundColor)
 
         self.layout().addWidget(view_type_container)
+        self.layout().addWidget(label_mode_container)
+        self.layout().addWidget(picking_mode_container)
+        self.layout().addWidget(contour_container)
         self.layout().addWidget(scene_background_color_btn)
         self.layout().addStretch()
 
@@ -76,6 +131,30 @@ class ScenePanel(BasePanel):
         else:
             self.scene.setWireframe(False)
 
+    def changeLabelMode(self):
+        if self.label_mode_btn_group.buttons()[0].isChecked():
+            self.scene.setSdfTextEnabled(False)
+
+        else:
+            self.scene.setSdfTextEnabled(True)
+
+    def changePickingMode(self):
+        if self.picking_mode_btn_group.buttons()[0].isChecked():
+            self.scene.setPickingMode(self.scene.PickingModeGpu)
+
+        else:
+            self.scene.setPickingMode(self.scene.PickingModeCpu)
+
+    def changeContourMode(self):
+        self.scene.setContoursVisible(self.contour_mode_btn_group.buttons()[0].isChecked())
+
+    def changeContourIntervals(self):
+        # Both inputs fire while their defaults are set up
+        if self.minor_interval_input is None or self.major_interval_input is None:
+            return
+
+        self.scene.setContourIntervals(self.minor_interval_input.value(), self.major_interval_input.value())
+
 
 class LayersPanel(BasePanel):
     def __init__(self, scene, parent=None):
@@ -149,10 +228,9 @@ class LayersPanel(BasePanel):
 
             if hasattr(list_item, 'item_type') and list_item.item_type in item_type_map:
                 target_item_type = item_type_map[list_item.item_type]
-                for item in self.scene.items():
-                    if isinstance(item, target_item_type):
-                        item.setVisible(container.checked())
-                        item.setColor(hexToRGB(container.color()))
+                for item in self.scene.itemsOfType(target_item_type):
+                    item.setVisible(container.checked())
+                    item.setColor(hexToRGB(container.color()))
 
         self.scene.update()
 